@@ -20,3 +20,4 @@ along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
 
 from .weakly_binding_future import ensure_weakly_binding_future
 from .threaded_async_decorator import threaded_async
+from .queue_reader import read_queue_batches
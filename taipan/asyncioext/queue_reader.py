@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of Taipan.
+
+Taipan is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Taipan is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+from queue import Empty
+from threading import Thread
+
+
+class _StopReading:
+    """ Sentinel put into the queue to terminate the reader thread. Classes
+    are pickled by reference, so the identity survives a
+    `multiprocessing.Queue`. """
+
+
+async def read_queue_batches(queue, loop=None):
+    r""" Asynchronously iterate over the items arriving in a (possibly
+    multiprocessing) queue, in batches.
+
+    A helper thread blocks on ``queue.get()`` and wakes the event loop only
+    when items are available. Every wakeup delivers all items that have
+    accumulated in the meantime as a single list, so a slow consumer does not
+    cause one loop iteration per item.
+
+    Parameters
+    ----------
+
+    queue : queue.Queue or multiprocessing.Queue
+        The queue to read from.
+
+    loop : BaseEventLoop, optional
+        The event loop to deliver the batches to.
+        Default: ``asyncio.get_event_loop()``.
+    """
+
+    if loop is None:
+        loop = asyncio.get_event_loop()
+
+    batches = asyncio.Queue()
+
+    def reader():
+        while True:
+            batch = [queue.get()]
+            while True:
+                try:
+                    batch.append(queue.get_nowait())
+                except Empty:
+                    break
+
+            loop.call_soon_threadsafe(batches.put_nowait, batch)
+            if any(item is _StopReading for item in batch):
+                return
+
+    thread = Thread(target=reader, daemon=True, name='queue reader')
+    thread.start()
+
+    try:
+        while True:
+            batch = await batches.get()
+            while not batches.empty():
+                batch += batches.get_nowait()
+
+            items = [item for item in batch if item is not _StopReading]
+            if items:
+                yield items
+            if len(items) != len(batch):
+                return
+    finally:
+        if thread.is_alive():
+            queue.put(_StopReading)
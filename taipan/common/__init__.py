@@ -20,7 +20,9 @@ along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
 from .components import (action, ComponentBase, DataSource,
                          DAQDevice, DataSink, Manipulator, PostProcessor)
 from .dataset import DataSet
+from .resultstore import ResultStore
 from .scan import Scan, Scan2ds
+from .ndscan import NDScan
 from .table import TabularMeasurements
 from .table_2m import TabularMeasurements2M
 from .units import ureg, Q_
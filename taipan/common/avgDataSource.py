@@ -5,15 +5,144 @@ Created on Thu Sep  8 12:21:50 2016
 @author: dave
 """
 import asyncio
+import enum
 
+import numpy as np
 import traitlets
 
 import common.components
-from common import DataSource, action
-from traitlets import Integer, Instance
+from common import DataSource, DataSet, Q_, action
+from common.traits import DataSet as DataSetTrait, Quantity
+from traitlets import Bool, Enum, Integer, Instance
 import logging
 
 
+class AveragingMode(enum.Enum):
+    Cumulative = 0
+    Rolling = 1
+    Exponential = 2
+
+
+class Accumulator:
+    """
+    Averages arrays of a fixed shape in preallocated float64 buffers.
+
+    Attributes
+    ----------
+    mode : `AveragingMode`
+        Cumulative: the arithmetic mean of all added arrays.
+        Rolling: the arithmetic mean of the last ``window`` added arrays.
+        Exponential: an exponentially weighted mean with a weight of
+        ``1 / window`` for each new array (``1 / count`` while
+        ``count < window``).
+    window : `int`
+        The window length of the rolling and exponential modes.
+    statistics : `bool`
+        Whether to keep track of the variance of the mean (Welford's
+        algorithm in cumulative mode).
+    count : `int`
+        The number of arrays contributing to the mean.
+    """
+
+    def __init__(self, shape, mode=AveragingMode.Cumulative, window=1,
+                 statistics=False):
+        self.mode = mode
+        self.window = max(int(window), 1)
+        self.statistics = statistics
+        self.count = 0
+
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape) if statistics else None
+        self._delta = np.empty(shape)
+
+        if mode == AveragingMode.Rolling:
+            self._history = np.empty((self.window,) + tuple(shape))
+            self._sum = np.zeros(shape)
+            self._sumSquares = np.zeros(shape) if statistics else None
+            self._next = 0
+
+    def add(self, values):
+        """
+        Add an array to the average.
+
+        Parameters
+        ----------
+        values : `numpy.ndarray`
+            The array to add. Must have the accumulator's shape.
+        """
+        if self.mode == AveragingMode.Rolling:
+            self._addRolling(values)
+            return
+
+        self.count += 1
+        if self.mode == AveragingMode.Cumulative:
+            weight = 1 / self.count
+        else:
+            weight = 1 / min(self.count, self.window)
+
+        # delta = values - mean; mean += weight * delta
+        np.subtract(values, self._mean, out=self._delta)
+        if self._m2 is None:
+            self._mean += weight * self._delta
+            return
+
+        if self.mode == AveragingMode.Cumulative:
+            self._mean += weight * self._delta
+            # m2 += delta * (values - updated mean)
+            self._m2 += self._delta * (values - self._mean)
+        else:
+            increment = weight * self._delta
+            self._mean += increment
+            self._m2 += self._delta * increment
+            self._m2 *= 1 - weight
+
+    def _addRolling(self, values):
+        # a view, even for 0-d data
+        slot = self._history[self._next, ...]
+        if self.count == self.window:
+            self._sum -= slot
+            if self._sumSquares is not None:
+                self._sumSquares -= slot ** 2
+        else:
+            self.count += 1
+
+        slot[...] = values
+        self._sum += slot
+        if self._sumSquares is not None:
+            self._sumSquares += slot ** 2
+        self._next = (self._next + 1) % self.window
+
+    def mean(self):
+        """ The current mean, as a new array. """
+        if self.mode == AveragingMode.Rolling:
+            return self._sum / max(self.count, 1)
+
+        return self._mean.copy()
+
+    def standardError(self):
+        """ The standard error of the current mean, as a new array. """
+        if not self.statistics:
+            raise RuntimeError("The accumulator does not keep statistics!")
+
+        if self.count < 2:
+            return np.full_like(self._delta, np.nan)
+
+        if self.mode == AveragingMode.Rolling:
+            variance = ((self._sumSquares - self._sum ** 2 / self.count) /
+                        (self.count - 1))
+            # rounding errors may make it slightly negative
+            variance = np.maximum(variance, 0)
+            return np.sqrt(variance / self.count)
+        elif self.mode == AveragingMode.Cumulative:
+            return np.sqrt(self._m2 / (self.count - 1) / self.count)
+        else:
+            # the exponential variance, scaled by the effective number of
+            # samples of the weighted mean
+            weight = 1 / min(self.count, self.window)
+            effectiveCount = min(self.count, (2 - weight) / weight)
+            return np.sqrt(self._m2 / effectiveCount)
+
+
 class AverageDataSource(DataSource):
     """
     Collects, sums up datasets and divides by the number of datasets.
@@ -21,11 +150,30 @@ class AverageDataSource(DataSource):
     Attributes
     ----------
     numberofAverages : `traitlets.Integer`
-        Total number of datasets to collect. Set by the user.
+        Total number of datasets to collect. Set by the user. In the rolling
+        and exponential modes, this is the window length.
     currentAverages : `traitlets.Integer`
         Dataset counter. Read only.
     dataLen : `traitlets.Integer`
         Number of datapoints in a dataset. Read only.
+    averagingMode : `traitlets.Enum`
+        Cumulative: every readDataSet averages ``numberofAverages`` new
+        datasets. Rolling/Exponential: the average persists between calls to
+        readDataSet until the source is started or stopped again, and every
+        readDataSet reads at least one new dataset.
+    computeStatistics : `traitlets.Bool`
+        Whether to compute the standard error of the average.
+    standardError : `taipan.common.traits.DataSet`
+        The standard error of the last average. Read only.
+    maxRetries : `traitlets.Integer`
+        Number of consecutive failed reads (wrong length or timeout) after
+        which readDataSet gives up.
+    readTimeout : `taipan.common.traits.Quantity`
+        Timeout of a single read from singleSource. Zero disables it.
+    streaming : `traitlets.Bool`
+        Instead of reading datasets one by one, fold every dataset published
+        in singleSource's ``currentData`` trait into the average as it
+        arrives. No pulse is missed while the average is being computed.
     singleSource: `traitlets.Instance`
         traitlets.Instance, Instance of class components.DataSource
     dataSource: `taipan.common.components.DataSource`
@@ -58,6 +206,22 @@ class AverageDataSource(DataSource):
     dataLen = Integer(0, read_only=True).tag(
         name="Expected Data Length")
 
+    averagingMode = Enum(AveragingMode, AveragingMode.Cumulative).tag(
+        name="Averaging mode")
+
+    computeStatistics = Bool(False).tag(name="Compute standard error")
+
+    standardError = DataSetTrait(read_only=True).tag(
+        name="Standard error", data_label="Standard error",
+        axes_labels=["Time"])
+
+    maxRetries = Integer(10, min=0).tag(name="Max. retries")
+
+    readTimeout = Quantity(Q_(0, 's'), min=Q_(0, 's')).tag(
+        name="Read timeout")
+
+    streaming = Bool(False).tag(name="Average live data")
+
     singleSource = Instance(DataSource, allow_none=True)
 
     def __init__(self, dataSource, objectName=None, loop=None):
@@ -74,14 +238,22 @@ class AverageDataSource(DataSource):
 
         super().__init__(objectName, loop)
         self.singleSource = dataSource
+        self._accumulator = None
+        self._accumulatorUnits = None
+        self._accumulatorAxes = None
+        self._subscribed = False
+        self._streamFuture = None
 
     async def start(self):
         """Awaits self.singleSource.start()"""
+        self._accumulator = None
         await self.singleSource.start()
 
     async def stop(self):
         """Awaits self.singleSource.stop() and sets trait currentAverages to 1"""
         self.set_trait('currentAverages', 1)
+        self._unsubscribe()
+        self._accumulator = None
         await self.singleSource.stop()
 
     @action("expected length")
@@ -93,6 +265,116 @@ class AverageDataSource(DataSource):
         cd = await self.singleSource.readDataSet()
         self.set_trait('dataLen', len(cd.data))
 
+    async def _readSingleDataSet(self):
+        """
+        Reads a dataset with the expected length from singleSource, retrying
+        at most `maxRetries` times.
+        """
+        timeout = self.readTimeout.to('s').magnitude or None
+
+        for attempt in range(self.maxRetries + 1):
+            try:
+                dataSet = await asyncio.wait_for(
+                    self.singleSource.readDataSet(), timeout)
+            except asyncio.TimeoutError:
+                logging.info("Timeout while reading data, retry!")
+                continue
+
+            if len(dataSet.data) == self.dataLen:
+                return dataSet
+
+            logging.info("Failed to read data with correct length, retry!")
+
+        raise Exception("Failed to read a dataset of length {} after {} "
+                        "attempts!".format(self.dataLen, self.maxRetries + 1))
+
+    def _matchesAccumulator(self):
+        acc = self._accumulator
+        return (acc is not None and acc.mode == self.averagingMode and
+                acc.window == self.numberofAverages and
+                acc.statistics == self.computeStatistics)
+
+    def _resetAccumulatorIfNeeded(self):
+        persistent = self.averagingMode != AveragingMode.Cumulative
+        if not persistent or not self._matchesAccumulator():
+            self._accumulator = None
+
+    def _fold(self, dataSet):
+        if self._accumulator is None:
+            self._accumulator = Accumulator(
+                dataSet.data.shape, self.averagingMode,
+                self.numberofAverages, self.computeStatistics)
+            self._accumulatorUnits = dataSet.data.units
+            self._accumulatorAxes = dataSet.axes
+
+        data = dataSet.data
+        if data.units != self._accumulatorUnits:
+            data = data.to(self._accumulatorUnits)
+        self._accumulator.add(data.magnitude)
+        self.set_trait('currentAverages',
+                       min(self._accumulator.count, self.numberofAverages))
+
+    def _finishAverage(self):
+        acc = self._accumulator
+        axes = self._accumulatorAxes
+        avDataSet = DataSet(Q_(acc.mean(), self._accumulatorUnits), axes)
+        if self.computeStatistics:
+            self.set_trait('standardError',
+                           DataSet(Q_(acc.standardError(),
+                                      self._accumulatorUnits), axes))
+
+        self._dataSetReady(avDataSet)
+        return avDataSet
+
+    def _subscribe(self):
+        if not self._subscribed:
+            self.singleSource.observe(self._liveDataArrived, 'currentData')
+            self._subscribed = True
+
+    def _unsubscribe(self):
+        if self._subscribed:
+            self.singleSource.unobserve(self._liveDataArrived, 'currentData')
+            self._subscribed = False
+
+    def _liveDataArrived(self, change):
+        dataSet = change['new']
+
+        fut = self._streamFuture
+        if fut is None or fut.done():
+            # Keep rolling and exponential averages up to date between reads.
+            # A cumulative average is complete once the read is satisfied,
+            # even if more data of the same batch arrives before the read
+            # resumes.
+            if (self._accumulator is None or
+                    self.averagingMode == AveragingMode.Cumulative):
+                return
+
+        if len(dataSet.data) != self.dataLen:
+            logging.info("Skipping live data with incorrect length!")
+            return
+
+        self._fold(dataSet)
+
+        if (fut is not None and not fut.done() and
+                self._accumulator.count >= self.numberofAverages):
+            fut.set_result(None)
+
+    async def _readStreamed(self):
+        if not self.singleSource.has_trait('currentData'):
+            raise Exception("{} does not publish live data, streaming "
+                            "averages are not possible!"
+                            .format(self.singleSource))
+
+        self._subscribe()
+        self._streamFuture = self._loop.create_future()
+        timeout = self.readTimeout.to('s').magnitude * self.numberofAverages
+        try:
+            await asyncio.wait_for(self._streamFuture, timeout or None)
+        except asyncio.TimeoutError:
+            raise Exception("Timeout while averaging live data!")
+        finally:
+            self._streamFuture = None
+
     async def readDataSet(self):
         """
         Reads dataset from singleSource, does the averaging and sets traits.
@@ -110,21 +392,16 @@ class AverageDataSource(DataSource):
         if self.numberofAverages < 1:
             logging.info("Averaging: Please insert a positive number, averages set to 1")
             self.numberofAverages = 1
-        avDataSet = await self.singleSource.readDataSet()
-        while len(avDataSet.data) != self.dataLen:
-            logging.info("Failed to read data with correct length, retry!")
-            avDataSet = await self.singleSource.readDataSet()
 
-        self.set_trait('currentAverages', 1)
-        while self.currentAverages < self.numberofAverages:
-            singleSet = await self.singleSource.readDataSet()
-            while len(singleSet.data) != self.dataLen:
-                logging.info("Failed to read data with correct length, retry!")
-                singleSet = await self.singleSource.readDataSet()
-
-            avDataSet.data += singleSet.data
-            self.set_trait('currentAverages', self.currentAverages + 1)
-        avDataSet.data /= self.numberofAverages
-        self._dataSetReady(avDataSet)
+        self._resetAccumulatorIfNeeded()
 
-        return avDataSet
+        if self.streaming:
+            await self._readStreamed()
+            return self._finishAverage()
+
+        self._unsubscribe()
+        self._fold(await self._readSingleDataSet())
+        while self._accumulator.count < self.numberofAverages:
+            self._fold(await self._readSingleDataSet())
+
+        return self._finishAverage()
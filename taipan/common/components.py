@@ -295,6 +295,11 @@ class Manipulator(ComponentBase):
                             read_only=True)
     limits = traitlets.Unicode(read_only=True).tag(name="Target value limits")
 
+    idlePollInterval = Quantity(Q_(500, 'ms'), min=Q_(10, 'ms')).tag(
+        name="Idle poll interval", group="Status polling")
+    movingPollInterval = Quantity(Q_(20, 'ms'), min=Q_(1, 'ms')).tag(
+        name="Moving poll interval", group="Status polling")
+
     def __init__(self, objectName=None, loop=None):
         super().__init__(objectName=objectName, loop=loop)
         self._trigStart = None
@@ -304,6 +309,10 @@ class Manipulator(ComponentBase):
 
         self.__blockTargetValueUpdate = False
 
+        self._moveInFlight = False
+        self._predictedArrival = None
+        self._pollWakeup = asyncio.Event()
+
     def setPreferredUnits(self, units, velocityUnits):
         self.__class__ = self.__original_class
 
@@ -370,6 +379,74 @@ class Manipulator(ComponentBase):
         self.targetValue = val
         self.__blockTargetValueUpdate = False
 
+    def _expectedMoveDuration(self, target, velocity=None):
+        """ Estimate the duration of a move to ``target`` in seconds from the
+        distance and the velocity, neglecting acceleration. Returns ``None``
+        if no estimate is possible, e.g. because the velocity is given in
+        device-specific units.
+        """
+        if velocity is None:
+            velocity = self.velocity
+
+        try:
+            duration = (abs(target - self.value) / abs(velocity)).to('s')
+            return float(duration.magnitude)
+        except Exception:
+            return None
+
+    def _moveStarted(self, expectedDuration=None):
+        """ Tell the status polling loop that a move has been started.
+
+        Until `_moveFinished` is called, `_waitForNextPoll` switches to
+        ``movingPollInterval``. If ``expectedDuration`` (in seconds) is
+        given, polling stays at ``idlePollInterval`` until the manipulator
+        is about to arrive at its target.
+        """
+        self._moveInFlight = True
+        self._predictedArrival = None
+        if expectedDuration is not None:
+            self._predictedArrival = self._loop.time() + expectedDuration
+        self._pollWakeup.set()
+
+    def _moveFinished(self):
+        """ Tell the status polling loop that the move has completed. """
+        self._moveInFlight = False
+        self._predictedArrival = None
+
+    def _nextPollInterval(self):
+        idle = self.idlePollInterval.to('s').magnitude
+        moving = self.movingPollInterval.to('s').magnitude
+
+        if not self._moveInFlight and self.status != self.Status.Moving:
+            return idle
+
+        if self._predictedArrival is None:
+            return moving
+
+        remaining = self._predictedArrival - self._loop.time() - moving
+        return min(idle, max(moving, remaining))
+
+    async def _waitForNextPoll(self):
+        """ Sleep until the next status poll is due.
+
+        Drivers polling the status of the manipulator should call this in
+        their update loop instead of sleeping for a fixed interval. While a
+        move is in flight, the poll happens every ``movingPollInterval``,
+        otherwise every ``idlePollInterval``. A move started with
+        `_moveStarted` cuts an idle wait short.
+        """
+        interval = self._nextPollInterval()
+        self._pollWakeup.clear()
+
+        try:
+            await asyncio.wait_for(self._pollWakeup.wait(), interval)
+        except asyncio.TimeoutError:
+            return
+
+        # a move has been started: give the controller a moment to report it
+        # before polling again
+        await asyncio.sleep(self._nextPollInterval())
+
     async def configureTrigger(self, axis):
         """ Configure the trigger output.
 
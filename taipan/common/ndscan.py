@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of Taipan.
+
+Taipan is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Taipan is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import enum
+import itertools
+import logging
+import numpy as np
+import traitlets
+from traitlets import Bool, Float
+from common import Manipulator, DataSource, action
+from common.units import Q_
+from common.resultstore import ResultStore
+
+
+def rasterOrder(shape):
+    """ Visit all points of a grid line by line, the last axis fastest. """
+    return itertools.product(*(range(n) for n in shape))
+
+
+def serpentineOrder(shape):
+    """ Visit all points of a grid line by line, reversing the direction of
+    each axis whenever one of the axes outside of it has advanced, so that
+    only a single axis moves by a single step between two points. """
+    for raster in rasterOrder(shape):
+        index = []
+        # the number of times the axes outside of the current one advanced
+        outer = 0
+        for r, n in zip(raster, shape):
+            index.append(n - 1 - r if outer % 2 else r)
+            outer = outer * n + r
+        yield tuple(index)
+
+
+class NDScan(DataSource):
+    """
+    A scan over any number of manipulators, replacing hand-nested `Scan`
+    objects.
+
+    The points of the scan are either the grid spanned by the axes added
+    with `addAxis`, or the rows of a table set with `setTable`. The points
+    are visited in the order given by ``traversal`` (or by a custom order
+    function, see `setOrder`); on every point, all manipulators whose target
+    changes move concurrently, then all data sources are read. The results
+    of every data source are written into a preallocated `ResultStore`
+    spanning all scan dimensions, so the assembled DataSets do not depend on
+    the traversal order.
+    """
+
+    class Traversal(enum.Enum):
+        Raster = 0
+        Serpentine = 1
+
+    traversal = traitlets.Enum(Traversal, default_value=Traversal.Raster).tag(
+        name="Traversal")
+
+    allowMoveDuringReadout = Bool(False, help="Allow the manipulators to move "
+                                              "to the next point while the "
+                                              "data sources are still reading "
+                                              "out, once the acquisition has "
+                                              "physically finished (only for "
+                                              "data sources providing "
+                                              "`acquisitionFinished`, e.g. "
+                                              "Scans).").tag(
+        name="Allow move during readout")
+
+    resume = Bool(False, help="Continue an interrupted scan instead of "
+                              "starting over, skipping the points which "
+                              "have already been acquired").tag(
+        name="Resume")
+
+    active = Bool(False, read_only=True, help="Whether the scan is currently "
+                                              "acquiring data").tag(
+        name="Active")
+
+    progress = Float(0, min=0, max=1, read_only=True).tag(name="Progress")
+
+    def __init__(self, axes=None, dataSources=None, objectName: str = None,
+                 loop: asyncio.BaseEventLoop = None):
+        """
+        Parameters
+        ----------
+        axes : list of tuples, optional
+            ``(manipulator, axis)`` pairs, outermost first, see `addAxis`.
+
+        dataSources : list of DataSource, optional
+            The data sources to read at every point.
+        """
+        super().__init__(objectName=objectName, loop=loop)
+
+        self._manipulators = []
+        self._velocities = []
+        self._axes = []
+        self._axisNames = []
+        self._table = None
+        self._order = None
+        self.rowNames = None
+
+        self.dataSources = list(dataSources or [])
+
+        for manipulator, axis in (axes or []):
+            self.addAxis(manipulator, axis)
+
+        self._activeFuture = None
+        self._acquisitionFinished = None
+        self._resultStores = None
+
+        # the index of the current point and the scan axes, for `DataSaver`
+        self.currentIndex = None
+        self.currentAxes = None
+
+        # incremented whenever a new hypercube is started (but not when
+        # resuming), tells `DataSaver` when to start a new file
+        self.runNumber = 0
+
+    def addAxis(self, manipulator: Manipulator, axis, velocity=None,
+                name=None):
+        """ Add a grid dimension, inside of all previously added ones.
+
+        Parameters
+        ----------
+        manipulator : Manipulator
+            The manipulator moving along this dimension.
+
+        axis : Quantity
+            The positions of this dimension.
+
+        velocity : Quantity, optional
+            The velocity used to move between points.
+
+        name : str, optional
+            The name of the dimension. Default: the manipulator's objectName.
+        """
+        if self._table is not None:
+            raise RuntimeError("Cannot add axes to a table scan!")
+
+        self._manipulators.append(manipulator)
+        self._velocities.append(velocity)
+        self._axes.append(axis)
+        self._axisNames.append(name or manipulator.objectName or
+                               'axis{}'.format(len(self._axes) - 1))
+
+    def setTable(self, manipulators, positions, velocities=None, names=None):
+        """ Scan the rows of a table instead of a grid.
+
+        Parameters
+        ----------
+        manipulators : list of Manipulator
+            The manipulators.
+
+        positions : list of lists
+            For every row, the position of every manipulator.
+
+        velocities : list of Quantity, optional
+            The velocity of every manipulator.
+
+        names : list of str, optional
+            The names of the rows.
+        """
+        if any(len(row) != len(manipulators) for row in positions):
+            raise RuntimeError("Every row needs a position for each of the "
+                               "{} manipulators!".format(len(manipulators)))
+
+        self._manipulators = list(manipulators)
+        self._velocities = list(velocities or [None] * len(manipulators))
+        self._table = [list(row) for row in positions]
+        self._axes = [Q_(np.arange(len(self._table)))]
+        self._axisNames = ['row']
+        self.rowNames = list(names) if names is not None else None
+
+    def setOrder(self, order):
+        """ Use a custom traversal order.
+
+        Parameters
+        ----------
+        order : callable or None
+            Called with the shape of the scan, returns an iterable of index
+            tuples (e.g. a generator). Points may be skipped. ``None``
+            restores the order given by ``traversal``.
+        """
+        self._order = order
+
+    @property
+    def axisNames(self):
+        return list(self._axisNames)
+
+    @property
+    def shape(self):
+        return tuple(len(axis) for axis in self._axes)
+
+    @property
+    def acquisitionFinished(self):
+        """See `Scan.acquisitionFinished`."""
+        return self._acquisitionFinished
+
+    @property
+    def partialDataSets(self):
+        """The data acquired so far by the current (or last) scan, one
+        DataSet per data source. Points which have not been acquired yet are
+        NaN. Returns `None` if no point has been acquired yet.
+        """
+        if self._resultStores is None:
+            return None
+
+        return [store.partialDataSet() for store in self._resultStores]
+
+    def _points(self):
+        if self._order is not None:
+            return self._order(self.shape)
+        elif self.traversal == self.Traversal.Serpentine:
+            return serpentineOrder(self.shape)
+        else:
+            return rasterOrder(self.shape)
+
+    def _targets(self, index):
+        if self._table is not None:
+            return self._table[index[0]]
+        return [axis[i] for axis, i in zip(self._axes, index)]
+
+    async def _moveTo(self, targets, lastTargets):
+        moves = []
+        for i, target in enumerate(targets):
+            if lastTargets is not None and lastTargets[i] == target:
+                continue
+            moves.append(self._manipulators[i].moveTo(target,
+                                                      self._velocities[i]))
+
+        await asyncio.gather(*moves)
+
+    def _store(self, index, dataSets):
+        for store, dataSet in zip(self._resultStores, dataSets):
+            store.setPoint(index, dataSet)
+
+        done = self._resultStores[0].pointsFilled
+        self.set_trait('progress', done / self._resultStores[0].size)
+
+    def _prepareResultStores(self):
+        stores = self._resultStores
+        if (self.resume and stores is not None and
+                len(stores) == len(self.dataSources) and
+                all(store.shape == self.shape for store in stores) and
+                not all(store.isComplete for store in stores)):
+            logging.info('Scan "{}": resuming, {} of {} points done'
+                         .format(self.objectName,
+                                 min(s.pointsFilled for s in stores),
+                                 stores[0].size))
+            return
+
+        self.runNumber += 1
+        self._resultStores = [ResultStore(self._axes)
+                              for _ in self.dataSources]
+
+    def _isAcquired(self, index):
+        return all(store.filled[index] for store in self._resultStores)
+
+    async def _doScan(self):
+        self._prepareResultStores()
+        self.currentAxes = list(self._axes)
+
+        for dataSource in self.dataSources:
+            await dataSource.start()
+
+        lastTargets = None
+        # the read out of the previous point, if it overlaps with the next move
+        pending = None
+
+        try:
+            for index in self._points():
+                index = tuple(index)
+                if self._isAcquired(index):
+                    continue
+
+                targets = self._targets(index)
+                move = self._loop.create_task(self._moveTo(targets,
+                                                           lastTargets))
+                lastTargets = targets
+
+                try:
+                    if pending is not None:
+                        pendingIndex, pendingRead = pending
+                        pending = None
+                        self._store(pendingIndex, await pendingRead)
+                except BaseException:
+                    # e.g. the scan was stopped: don't wait for the moves
+                    move.cancel()
+                    raise
+
+                await move
+
+                self.currentIndex = index
+                reads = asyncio.gather(*(dataSource.readDataSet()
+                                         for dataSource in self.dataSources))
+                acquired = [getattr(dataSource, 'acquisitionFinished', None)
+                            for dataSource in self.dataSources]
+
+                if (self.allowMoveDuringReadout and
+                        all(fut is not None for fut in acquired)):
+                    await asyncio.wait([reads, asyncio.gather(*acquired)],
+                                       return_when=asyncio.FIRST_COMPLETED)
+                    if not reads.done():
+                        pending = (index, reads)
+                        continue
+
+                self._store(index, await reads)
+
+            fut = self._acquisitionFinished
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+            if pending is not None:
+                pendingIndex, pendingRead = pending
+                pending = None
+                self._store(pendingIndex, await pendingRead)
+        finally:
+            if pending is not None:
+                pending[1].cancel()
+
+        for dataSource in self.dataSources:
+            await dataSource.stop()
+
+        return [store.dataSet() for store in self._resultStores]
+
+    @action("Stop")
+    async def stop(self):
+        if not self._activeFuture:
+            return
+
+        self._activeFuture.cancel()
+
+    def readDataSet(self):
+        self._acquisitionFinished = self._loop.create_future()
+        self._activeFuture = self._loop.create_task(self._readDataSetImpl())
+        return self._activeFuture
+
+    async def _readDataSetImpl(self):
+        if not self._activeFuture:
+            raise asyncio.InvalidStateError()
+
+        if self.active:
+            raise asyncio.InvalidStateError()
+
+        if not self._manipulators or not self.dataSources:
+            raise RuntimeError("The scan needs at least one manipulator and "
+                               "one data source!")
+
+        self.set_trait('active', True)
+        self.set_trait('progress', 0)
+
+        try:
+            for dataSource in self.dataSources:
+                await dataSource.stop()
+
+            dataSets = await self._doScan()
+
+            for dataSet in dataSets:
+                self._dataSetReady(dataSet)
+
+            if len(dataSets) == 1:
+                return dataSets[0]
+            return tuple(dataSets)
+
+        except asyncio.CancelledError:
+            logging.warning('Scan "{}" was cancelled'.format(self.objectName))
+            raise
+
+        finally:
+            fut = self._acquisitionFinished
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+            for dataSource in self.dataSources:
+                self._loop.create_task(dataSource.stop())
+            for manipulator in self._manipulators:
+                manipulator.stop()
+
+            self.set_trait('active', False)
+            self._activeFuture = None
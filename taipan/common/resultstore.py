@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of Taipan.
+
+Copyright (C) 2015 - 2017 Arno Rehn <arno@arnorehn.de>
+
+Taipan is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Taipan is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+from .dataset import DataSet
+from .units import Q_
+
+
+class ResultStore:
+    """
+    Preallocated storage for the DataSets acquired during a scan.
+
+    The store knows the axes of the scan itself (the "outer" axes). As soon as
+    the first point arrives, the full array is allocated with the shape
+    ``outer shape + point shape`` and every point is written in place. Points
+    which have not been acquired yet are filled with NaN.
+
+    Attributes
+    ----------
+    axes : `list`
+        The outer axes of the scan.
+    shape : `tuple`
+        The outer shape, i.e. the lengths of ``axes``.
+    data : `numpy.ndarray` or `None`
+        The raw magnitudes. `None` until the first point has been stored.
+    units : `pint.Unit` or `None`
+        The units of the stored data, taken from the first point.
+    pointAxes : `list` or `None`
+        The axes of a single point, taken from the first point.
+    pointsFilled : `int`
+        The number of distinct points stored so far.
+    """
+
+    def __init__(self, axes):
+        """
+        Parameters
+        ----------
+        axes : `list`
+            The outer axes of the scan, outermost first.
+        """
+        self.axes = list(axes)
+        self.shape = tuple(len(ax) for ax in self.axes)
+        self.data = None
+        self.units = None
+        self.pointAxes = None
+        self.filled = np.zeros(self.shape, dtype=bool)
+        self.pointsFilled = 0
+
+    @property
+    def size(self):
+        """The total number of points of the scan."""
+        return int(np.prod(self.shape, dtype=int))
+
+    @property
+    def isComplete(self):
+        return self.pointsFilled == self.size
+
+    def _allocate(self, dataSet):
+        magnitude = np.asarray(dataSet.data.magnitude)
+        dtype = np.result_type(magnitude.dtype, np.float64)
+        self.data = np.full(self.shape + magnitude.shape, np.nan, dtype=dtype)
+        self.units = dataSet.data.units
+        self.pointAxes = list(dataSet.axes)
+
+    def setPoint(self, index, dataSet):
+        """
+        Write a single point into the store.
+
+        Parameters
+        ----------
+        index : `int` or `tuple`
+            The position of the point along the outer axes.
+        dataSet : `taipan.common.dataset.DataSet`
+            The data of the point. Its shape has to match the first point's.
+        """
+        if not isinstance(index, tuple):
+            index = (index,)
+
+        if self.data is None:
+            self._allocate(dataSet)
+
+        data = dataSet.data
+        if data.units != self.units:
+            data = data.to(self.units)
+
+        self.data[index] = data.magnitude
+
+        if not self.filled[index]:
+            self.filled[index] = True
+            self.pointsFilled += 1
+
+    def dataSet(self):
+        """
+        Returns a DataSet wrapping the store's array (without copying).
+
+        Returns
+        -------
+        `taipan.common.dataset.DataSet`
+            The DataSet containing all points with the outer axes prepended to
+            the axes of a single point.
+        """
+        if self.data is None:
+            raise RuntimeError("No data has been stored yet!")
+
+        return DataSet(Q_(self.data, self.units),
+                       self.axes + self.pointAxes)
+
+    def partialDataSet(self):
+        """
+        Returns a copy of the data acquired so far, or `None` if no point has
+        been stored yet. Missing points are NaN.
+        """
+        if self.data is None:
+            return None
+
+        return DataSet(Q_(self.data.copy(), self.units),
+                       self.axes + self.pointAxes)
@@ -19,14 +19,38 @@ along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 
-from common import DataSink
-from common.traits import Path as PathTrait
+from common import DataSink, Q_
+from common.traits import Path as PathTrait, Quantity
 from enum import Enum, unique
-from traitlets import Bool, Enum as EnumTrait, Unicode
+from functools import partial
+from traitlets import Bool, Enum as EnumTrait, Int, Unicode, observe
 import numpy as np
 from datetime import datetime
 import logging
+import queue
+from collections import deque
+import time
 from copy import deepcopy
+from threading import Thread
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+def _hdf5ChunkShape(outerShape, pointShape, itemSize, targetBytes=2**16):
+    """ The chunk shape of an HDF5 hypercube of points.
+
+    Every chunk holds whole points along the innermost scan dimension, as
+    many as fit into ``targetBytes``. Small points (e.g. scalars of a lock-in
+    amplifier) are thus stored a line at a time instead of in a chunk of their
+    own each, while large points still get a chunk per point.
+    """
+    chunk = tuple(max(n, 1) for n in pointShape)
+    pointBytes = itemSize * int(np.prod(chunk))
+    inner = min(outerShape[-1], max(targetBytes // pointBytes, 1))
+    return (1,) * (len(outerShape) - 1) + (inner,) + chunk
 
 
 def _getManipulatorValueInPreferredUnits(m):
@@ -64,6 +88,28 @@ class DataSaver(DataSink):
     enabled = Bool(False, help="Whether data storage is enabled").tag(
                          name="Enabled")
 
+    hdf5Compression = Bool(True, help="Whether to gzip-compress the data "
+                                      "stored in HDF5 files").tag(
+                               name="Compress HDF5 files")
+
+    asyncWrites = Bool(False, help="Whether to write the data in a "
+                                   "background thread instead of on the "
+                                   "event loop").tag(
+                           name="Asynchronous writes",
+                           group="Background writer")
+    writeQueueLength = Int(16, min=1, help="The maximum number of data sets "
+                                           "handed to the writer thread. "
+                                           "Further data sets wait on the "
+                                           "event loop until a slot is "
+                                           "free.").tag(
+                               name="Write queue length",
+                               group="Background writer")
+    queueDepth = Int(0, read_only=True).tag(name="Queued data sets",
+                                            group="Background writer")
+    lastWriteLatency = Quantity(Q_(0, 'ms'), read_only=True).tag(
+                                name="Last write latency",
+                                group="Background writer")
+
     _manipulators = {}
     _attributes = {}
 
@@ -72,6 +118,96 @@ class DataSaver(DataSink):
     _fileNameTranslationTable = str.maketrans(_forbiddenCharacters,
                                               '_' * len(_forbiddenCharacters))
 
+    def __init__(self, objectName=None, loop=None):
+        super().__init__(objectName=objectName, loop=loop)
+        self._scans = []
+        self._hdf5File = None
+        self._hdf5Layout = None
+        self._writeQueue = None
+        self._writerThread = None
+        # jobs waiting for a free slot in the write queue, in order
+        self._backlog = deque()
+        self._feeder = None
+
+    async def __aexit__(self, *args):
+        await super().__aexit__(*args)
+        await self.flush()
+        self._stopWriterThread()
+        self._closeHDF5File()
+
+    async def flush(self):
+        """
+        Wait until all queued data sets have been written.
+        """
+        if self._feeder is not None:
+            await self._feeder
+        if self._writeQueue is not None:
+            await self._loop.run_in_executor(None, self._writeQueue.join)
+
+    def _startWriterThread(self):
+        self._writeQueue = queue.Queue(maxsize=self.writeQueueLength)
+        self._writerThread = Thread(target=self._writerLoop,
+                                    args=(self._writeQueue,), daemon=True,
+                                    name='DataSaver writer')
+        self._writerThread.start()
+
+    def _stopWriterThread(self):
+        if self._writerThread is None:
+            return
+
+        self._writeQueue.put(None)
+        self._writerThread.join()
+        self._writerThread = None
+        self._writeQueue = None
+
+    @observe('asyncWrites')
+    def _asyncWritesChanged(self, change):
+        if change['new'] or self._writeQueue is None:
+            return
+
+        async def stopWriter():
+            # until the writer is stopped, `process` keeps using it, so
+            # that the data sets are written in order
+            await self.flush()
+            if not self.asyncWrites:
+                self._stopWriterThread()
+
+        self._loop.create_task(stopWriter())
+
+    async def _feedWriter(self):
+        writeQueue = self._writeQueue
+        while self._backlog:
+            # wait for a free slot in a worker thread, not on the event loop
+            await self._loop.run_in_executor(None, writeQueue.put,
+                                             self._backlog[0])
+            self._backlog.popleft()
+            self._updateQueueDepth()
+
+    def _updateQueueDepth(self):
+        queued = self._writeQueue.qsize() if self._writeQueue else 0
+        self.set_trait('queueDepth', queued + len(self._backlog))
+
+    def _writerLoop(self, writeQueue):
+        while True:
+            job = writeQueue.get()
+            try:
+                if job is None:
+                    return
+
+                start = time.perf_counter()
+                try:
+                    filename = job()
+                    logging.info("Saved data as {}".format(filename))
+                except Exception:
+                    logging.exception("Failed to save data")
+                latency = Q_(time.perf_counter() - start, 's').to('ms')
+
+                self._loop.call_soon_threadsafe(
+                    self.set_trait, 'lastWriteLatency', latency)
+                self._loop.call_soon_threadsafe(self._updateQueueDepth)
+            finally:
+                writeQueue.task_done()
+
     def registerManipulator(self, manipulator, name=None):
         if name is None:
             name = manipulator.objectName
@@ -100,6 +236,22 @@ class DataSaver(DataSink):
             trait.metadata['help'] += additionalHelpString
         self.add_traits(fileNameTemplate=trait)
 
+    def registerScan(self, scan):
+        """
+        Register a stepped Scan whose axis becomes a dimension of the HDF5
+        data set (or an `NDScan`, contributing all of its dimensions).
+        Register the outermost Scan first.
+
+        While the registered Scans are active, every DataSet passed to
+        `process` is written at the Scans' current indices into a single
+        HDF5 file, instead of creating one file per DataSet.
+
+        Parameters
+        ----------
+        scan : `taipan.common.scan.Scan`
+            The Scan to register.
+        """
+        self._scans.append(scan)
 
     def _getFileName(self):
         date = datetime.now().isoformat().replace(':', '-')
@@ -119,43 +271,156 @@ class DataSaver(DataSink):
         formattedName = formattedName.translate(self._fileNameTranslationTable)
         return str(self.path.joinpath(formattedName))
 
-    def _saveTxt(self, data):
-        if len(data.axes) > 1 or len(data.axes) == 0:
-            raise Exception("Only 1-dimensional data can be saved as text "
-                            "files!")
-
+    def _saveTxt(self, data, filename, withHeaders):
         toSave = np.array([data.axes[0].magnitude, data.data.magnitude]).T
         header = ''
-        if self.textFileWithHeaders:
+        if withHeaders:
             header = '{:C} {:C}'.format(data.axes[0].units, data.data.units)
-        filename = self._getFileName()
         np.savetxt(filename, toSave, header=header)
         return filename
 
-    def _saveHDF5(self, data):
-        raise NotImplementedError("Saving as HDF5 has not yet been "
-                                  "implemented")
+    def _closeHDF5File(self):
+        if self._hdf5File is not None:
+            fileName = self._hdf5File.filename
+            self._hdf5File.close()
+            logging.info("Closed HDF5 file {}".format(fileName))
+        self._hdf5File = None
+        self._hdf5Layout = None
+
+    def _createHDF5File(self, data, filename, layout, outerAxes, outerNames,
+                        compression):
+        outerShape = tuple(len(ax) for ax in outerAxes)
+        magnitude = np.asarray(data.data.magnitude)
+
+        dtype = np.result_type(magnitude.dtype, np.float64)
+
+        chunks = None
+        if outerShape:
+            chunks = _hdf5ChunkShape(outerShape, magnitude.shape,
+                                     dtype.itemsize)
+
+        f = h5py.File(filename, 'w')
+        dset = f.create_dataset(
+            'data', shape=outerShape + magnitude.shape, dtype=dtype,
+            chunks=chunks, fillvalue=np.nan,
+            compression='gzip' if compression and chunks else None)
+        dset.attrs['units'] = '{:C}'.format(data.data.units)
+        dset.attrs['pointsWritten'] = 0
+
+        axisNames = list(outerNames)
+        axisNames += ['axis{}'.format(i + len(outerNames))
+                      for i in range(len(data.axes))]
+        for i, (name, ax) in enumerate(zip(axisNames, outerAxes + data.axes)):
+            axDset = f.create_dataset('axis{}'.format(i),
+                                      data=np.asarray(ax.magnitude))
+            axDset.attrs['units'] = '{:C}'.format(ax.units)
+            axDset.make_scale(name)
+            dset.dims[i].attach_scale(axDset)
+
+        self._hdf5File = f
+        self._hdf5Layout = layout
+
+    def _saveHDF5(self, data, filename, layout, index, outerAxes, outerNames,
+                  compression):
+        # the layout includes the run of the outermost scan, so every new
+        # hypercube starts a new file
+        if self._hdf5File is None or layout != self._hdf5Layout:
+            self._closeHDF5File()
+            self._createHDF5File(data, filename, layout, outerAxes,
+                                 outerNames, compression)
+
+        dset = self._hdf5File['data']
+        dset[index] = data.data.to(dset.attrs['units']).magnitude
+        dset.attrs['pointsWritten'] += 1
+        filename = self._hdf5File.filename
+
+        if dset.attrs['pointsWritten'] >= np.prod(dset.shape[:len(index)]):
+            self._closeHDF5File()
+        else:
+            self._hdf5File.flush()
 
-    def _saveNumpy(self, data):
-        fileName = self._getFileName()
+        return filename
+
+    def _saveNumpy(self, data, filename):
         axesUnits = ['{:C}'.format(ax.units) for ax in data.axes]
         dataUnits = '{:C}'.format(data.data.units)
         unitlessAxes = [ax.magnitude for ax in data.axes]
-        np.savez_compressed(fileName, axes=unitlessAxes, axesUnits=axesUnits,
+        np.savez_compressed(filename, axes=unitlessAxes, axesUnits=axesUnits,
                             data=data.data.magnitude, dataUnits=dataUnits)
-        return fileName
+        return filename
+
+    def _prepareSave(self, data):
+        """
+        Evaluate everything that depends on the state of other components
+        (file name, scan indices, ...) and return a callable that does the
+        actual writing. The callable may be run in the writer thread.
+        """
+        if self.fileFormat == self.Formats.Text:
+            if len(data.axes) > 1 or len(data.axes) == 0:
+                raise Exception("Only 1-dimensional data can be saved as "
+                                "text files!")
+
+            return partial(self._saveTxt, data, self._getFileName(),
+                           self.textFileWithHeaders)
+        elif self.fileFormat == self.Formats.HDF5:
+            if h5py is None:
+                raise RuntimeError("Saving as HDF5 requires the h5py "
+                                   "package!")
+
+            scans = [scan for scan in self._scans if scan.active]
+            index = ()
+            outerAxes = []
+            outerNames = []
+            for scan in scans:
+                if isinstance(scan.currentIndex, tuple):
+                    # N-dimensional scans, e.g. `NDScan`
+                    index += scan.currentIndex
+                    outerAxes += scan.currentAxes
+                    outerNames += scan.axisNames
+                else:
+                    index += (scan.currentIndex,)
+                    outerAxes.append(scan.currentAxis)
+                    outerNames.append(scan.objectName or
+                                      'axis{}'.format(len(outerNames)))
+            # a new run of the outermost scan starts a new hypercube
+            run = scans[0].runNumber if scans else None
+            layout = (tuple(id(scan) for scan in scans), run,
+                      tuple(len(ax) for ax in outerAxes) +
+                      np.shape(data.data.magnitude))
+
+            return partial(self._saveHDF5, data, self._getFileName(), layout,
+                           index, outerAxes, outerNames, self.hdf5Compression)
+        elif self.fileFormat == self.Formats.Numpy:
+            return partial(self._saveNumpy, data, self._getFileName())
 
     def process(self, data):
         if not self.enabled:
             logging.info("Data storage is disabled, not saving data.")
             return
 
-        filename = None
-        if self.fileFormat == self.Formats.Text:
-            filename = self._saveTxt(data)
-        elif self.fileFormat == self.Formats.HDF5:
-            filename = self._saveHDF5(data)
-        elif self.fileFormat == self.Formats.Numpy:
-            filename = self._saveNumpy(data)
+        job = self._prepareSave(data)
+
+        # a writer which is still draining after asyncWrites was turned off
+        # keeps being used, see _asyncWritesChanged
+        if not self.asyncWrites and self._writeQueue is None:
+            filename = job()
+            logging.info("Saved data as {}".format(filename))
+            return
 
-        logging.info("Saved data as {}".format(filename))
+        if self._writeQueue is None:
+            self._startWriterThread()
+
+        if not self._backlog:
+            try:
+                self._writeQueue.put_nowait(job)
+                self._updateQueueDepth()
+                return
+            except queue.Full:
+                logging.warning("DataSaver write queue is full, keeping data "
+                                "sets on the event loop until the writer "
+                                "catches up")
+
+        self._backlog.append(job)
+        if self._feeder is None or self._feeder.done():
+            self._feeder = self._loop.create_task(self._feedWriter())
+        self._updateQueueDepth()
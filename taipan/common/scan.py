@@ -19,13 +19,14 @@ along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import asyncio
-from common import Manipulator, DataSource, DataSet, action
+from common import Manipulator, DataSource, action
 import numpy as np
 import warnings
 from traitlets import Bool, Float, Instance
 from copy import deepcopy
 from common.traits import Quantity
 from common.units import Q_
+from common.resultstore import ResultStore
 import logging
 
 
@@ -63,6 +64,29 @@ class Scan(DataSource):
                                     "position at the end of the scan.").tag(
         name="Retract manipulator at end")
 
+    serpentine = Bool(False, help="Alternate the scan direction on every "
+                                  "acquisition, e.g. when nested within an "
+                                  "outer scan. The data is always returned "
+                                  "in the order of the non-reversed axis. "
+                                  "The manipulator is never retracted in "
+                                  "this mode.").tag(
+        name="Serpentine")
+
+    reverseTriggerOffset = Quantity(Q_(0), help="Offset added to the trigger "
+                                                "positions of continuous scans "
+                                                "in reverse direction, e.g. to "
+                                                "compensate for trigger "
+                                                "latency").tag(
+        name="Reverse trigger offset")
+
+    allowMoveDuringReadout = Bool(False, help="Allow the manipulator to move "
+                                              "while data is still being "
+                                              "read out after the acquisition "
+                                              "has physically finished, e.g. "
+                                              "the next step of an outer "
+                                              "scan or the retract movement."
+                                  ).tag(name="Allow move during readout")
+
     active = Bool(False, read_only=True, help="Whether the scan is currently "
                                               "acquiring data").tag(
         name="Active")
@@ -78,6 +102,7 @@ class Scan(DataSource):
         self.__original_class = self.__class__
 
         self.observe(self._setUnits, 'manipulator')
+        self.observe(self._resetDirection, 'serpentine')
 
         self.manipulator = manipulator
         self.dataSource = dataSource
@@ -93,6 +118,18 @@ class Scan(DataSource):
 
         self.continuousScan = False
         self._activeFuture = None
+        self._acquisitionFinished = None
+        self._retracting = False
+        self._reverseNext = False
+        self._resultStore = None
+
+        # the axis and the index of the current point of a stepped scan
+        self.currentAxis = None
+        self.currentIndex = None
+
+        # incremented on every run of the scan, tells `DataSaver` when a new
+        # hypercube starts
+        self.runNumber = 0
 
     def _setUnits(self, change):
         """Copy the unit from the Manipulator to the metadata of the traits."""
@@ -104,7 +141,7 @@ class Scan(DataSource):
             return
 
         traitsWithBaseUnits = ['minimumValue', 'maximumValue', 'step',
-                               'overscan']
+                               'overscan', 'reverseTriggerOffset']
         traitsWithVelocityUnits = ['positioningVelocity', 'scanVelocity']
 
         baseUnits = manip.trait_metadata('value', 'preferred_units')
@@ -127,6 +164,36 @@ class Scan(DataSource):
 
         self.add_traits(**newTraits)
 
+    @property
+    def acquisitionFinished(self):
+        """A future which resolves as soon as the data of the current (or
+        last) `readDataSet` call has physically been acquired, i.e. the
+        manipulator of this scan has stopped acquiring. Read out and
+        post-processing of the data may still be ongoing.
+        """
+        return self._acquisitionFinished
+
+    def _acquisitionDone(self, axis=None):
+        fut = self._acquisitionFinished
+        if fut is not None and not fut.done():
+            fut.set_result(None)
+
+        if (axis is not None and self.allowMoveDuringReadout and
+                self.retractAtEnd and not self.serpentine):
+            self._retract(axis)
+
+    def _retract(self, axis):
+        if self._retracting:
+            return
+        self._retracting = True
+        self._loop.create_task(
+            self.manipulator.moveTo(axis[0] - self._getOverscan(axis),
+                                    self.positioningVelocity)
+        )
+
+    def _resetDirection(self, change=None):
+        self._reverseNext = False
+
     def updateProgress(self, axis):
         delta = axis[-1] - axis[0]
 
@@ -168,14 +235,20 @@ class Scan(DataSource):
 
         return overscan
 
-    async def _doContinuousScan(self, axis):
+    async def _doContinuousScan(self, axis, reverse=False):
+        prefUnits = axis.units
+        triggerOffset = Q_(0, prefUnits)
+        if reverse:
+            axis = axis[::-1]
+            triggerOffset = self.reverseTriggerOffset.to(prefUnits)
+
         overscan = self._getOverscan(axis)
 
         await self.manipulator.moveTo(axis[0] - overscan,
                                       self.positioningVelocity)
 
-        prefUnits = axis.units
-        axis = (await self.manipulator.configureTrigger(axis)).to(prefUnits)
+        axis = (await self.manipulator.configureTrigger(axis + triggerOffset)
+                ).to(prefUnits) - triggerOffset
 
         updater = self.updateProgress(axis)
 
@@ -194,6 +267,8 @@ class Scan(DataSource):
         finally:
             self.manipulator.unobserve(updater, 'value')
 
+        self._acquisitionDone(axis)
+
         dataSet = await self.dataSource.readDataSet()
         dataSet.checkConsistency()
         dataSet.axes = dataSet.axes.copy()
@@ -214,25 +289,90 @@ class Scan(DataSource):
                 dataSet.data = dataSet.data.copy()
                 dataSet.data.resize((expectedLength,) + dataSet.data.shape[1:])
 
+        if reverse:
+            # back into the order of the non-reversed axis
+            axis = axis[::-1]
+            dataSet.data = dataSet.data[::-1]
+            dataSet.axes[0] = axis
+
         return dataSet, axis
 
-    async def _doSteppedScan(self, axis):
-        accumulator = []
+    @property
+    def partialDataSet(self):
+        """The data acquired so far by the current (or last) stepped scan.
+
+        Points which have not been acquired yet are NaN. Returns `None` if no
+        point has been acquired yet.
+        """
+        if self._resultStore is None:
+            return None
+
+        return self._resultStore.partialDataSet()
+
+    def _scanOrder(self, axis, reverse):
+        """ The indices of ``axis`` in the order in which they are visited. """
+        indices = range(len(axis))
+        if reverse:
+            return indices[::-1]
+        return indices
+
+    async def _doSteppedScan(self, axis, reverse=False):
+        # the results are stored in the order of the non-reversed axis
+        self._resultStore = ResultStore([axis])
+        self.currentAxis = axis
         await self.dataSource.start()
-        updater = self.updateProgress(axis)
+        updater = self.updateProgress(axis[::-1] if reverse else axis)
         self.manipulator.observe(updater, 'value')
-        for position in axis:
-            await self.manipulator.moveTo(position, self.scanVelocity)
-            accumulator.append(await self.dataSource.readDataSet())
-        self.manipulator.unobserve(updater, 'value')
-        await self.dataSource.stop()
 
-        axes = accumulator[0].axes.copy()
-        axes.insert(0, axis)
-        data = np.array([dset.data.magnitude for dset in accumulator])
-        data = data * accumulator[0].data.units
+        # the read out of the previous point, if it overlaps with the next move
+        pending = None
+
+        try:
+            for i in self._scanOrder(axis, reverse):
+                move = self._loop.create_task(
+                    self.manipulator.moveTo(axis[i], self.scanVelocity))
+
+                try:
+                    if pending is not None:
+                        pendingIndex, pendingRead = pending
+                        pending = None
+                        self._resultStore.setPoint(pendingIndex,
+                                                   await pendingRead)
+                except BaseException:
+                    # e.g. the scan was stopped: don't wait for the move
+                    move.cancel()
+                    raise
+
+                await move
+
+                self.currentIndex = i
+                read = asyncio.ensure_future(self.dataSource.readDataSet())
+                acquired = getattr(self.dataSource, 'acquisitionFinished',
+                                   None)
+
+                if self.allowMoveDuringReadout and acquired is not None:
+                    await asyncio.wait([read, acquired],
+                                       return_when=asyncio.FIRST_COMPLETED)
+                    if not read.done():
+                        pending = (i, read)
+                        continue
+
+                self._resultStore.setPoint(i, await read)
+
+            self._acquisitionDone(axis)
+
+            if pending is not None:
+                pendingIndex, pendingRead = pending
+                pending = None
+                self._resultStore.setPoint(pendingIndex, await pendingRead)
+        finally:
+            if pending is not None:
+                pending[1].cancel()
+            self.manipulator.unobserve(updater, 'value')
+
+        await self.dataSource.stop()
 
-        return DataSet(data, axes)
+        return self._resultStore.dataSet()
 
     @action("Stop")
     async def stop(self):
@@ -260,6 +400,8 @@ class Scan(DataSource):
         return fut
 
     def readDataSet(self):
+        self.runNumber += 1
+        self._acquisitionFinished = self._loop.create_future()
         self._activeFuture = self._loop.create_task(self._readDataSetImpl())
         return self._activeFuture
 
@@ -272,6 +414,7 @@ class Scan(DataSource):
 
         self.set_trait('active', True)
         self.set_trait('progress', 0)
+        self._retracting = False
 
         axis = None
 
@@ -292,11 +435,15 @@ class Scan(DataSource):
                     * stepUnits)
 
             dataSet = None
+            reverse = self.serpentine and self._reverseNext
 
             if self.continuousScan:
-                dataSet, axis = await self._doContinuousScan(axis)
+                dataSet, axis = await self._doContinuousScan(axis, reverse)
             else:
-                dataSet = await self._doSteppedScan(axis)
+                dataSet = await self._doSteppedScan(axis, reverse)
+
+            if self.serpentine:
+                self._reverseNext = not self._reverseNext
 
             self._dataSetReady(dataSet)
             return dataSet
@@ -306,13 +453,13 @@ class Scan(DataSource):
             raise
 
         finally:
+            self._acquisitionDone()
             self._loop.create_task(self.dataSource.stop())
-            self.manipulator.stop()
-            if self.retractAtEnd and axis is not None:
-                self._loop.create_task(
-                    self.manipulator.moveTo(axis[0] - self._getOverscan(axis),
-                                            self.positioningVelocity)
-                )
+            if not self._retracting:
+                self.manipulator.stop()
+            if (self.retractAtEnd and not self.serpentine and
+                    axis is not None):
+                self._retract(axis)
 
             self.set_trait('active', False)
             self._activeFuture = None
@@ -324,34 +471,43 @@ class Scan2ds(Scan):
     def __init__(self, datasource2: DataSource = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.dataSource2 = datasource2
+        self._resultStore2 = None
 
-    async def _doSteppedScan(self, axis):
-        accumulator = []
+    @property
+    def partialDataSet2(self):
+        """The data acquired so far from ``dataSource2``, see
+        `Scan.partialDataSet`."""
+        if self._resultStore2 is None:
+            return None
+
+        return self._resultStore2.partialDataSet()
+
+    async def _doSteppedScan(self, axis, reverse=False):
+        self._resultStore = ResultStore([axis])
+        self._resultStore2 = ResultStore([axis])
+        self.currentAxis = axis
         await self.dataSource.start()
         await self.dataSource2.start()
-        updater = self.updateProgress(axis)
+        updater = self.updateProgress(axis[::-1] if reverse else axis)
         self.manipulator.observe(updater, 'value')
-        for position in axis:
-            await self.manipulator.moveTo(position, self.scanVelocity)
-            accumulator.append((await self.dataSource.readDataSet(), await self.dataSource2.readDataSet()))
+        for i in self._scanOrder(axis, reverse):
+            self.currentIndex = i
+            await self.manipulator.moveTo(axis[i], self.scanVelocity)
+            self._resultStore.setPoint(i, await self.dataSource.readDataSet())
+            self._resultStore2.setPoint(i, await self.dataSource2.readDataSet())
         self.manipulator.unobserve(updater, 'value')
         await self.dataSource.stop()
         await self.dataSource2.stop()
 
-        first_dataset_ds1 = accumulator[0][0]
-        first_dataset_ds2 = accumulator[0][1]
-
-        axes = first_dataset_ds1.axes.copy()  # assuming axes are the same for both datasources
-        axes.insert(0, axis)
-
-        data_datasource1 = np.array([tup[0].data.magnitude for tup in accumulator]) * first_dataset_ds1.data.units
-        data_datasource2 = np.array([tup[1].data.magnitude for tup in accumulator]) * first_dataset_ds2.data.units
-
-        dataset1, dataset2 = DataSet(data_datasource1, axes), DataSet(data_datasource2, axes)
+        # both stores carry the point axes of their own data source
+        dataset1 = self._resultStore.dataSet()
+        dataset2 = self._resultStore2.dataSet()
 
         return dataset1, dataset2
 
     def readDataSet(self):
+        self.runNumber += 1
+        self._acquisitionFinished = self._loop.create_future()
         self._activeFuture = self._loop.create_task(self._readDataSetImpl())
         return self._activeFuture
 
@@ -364,6 +520,7 @@ class Scan2ds(Scan):
 
         self.set_trait('active', True)
         self.set_trait('progress', 0)
+        self._retracting = False
 
         axis = None
 
@@ -385,11 +542,15 @@ class Scan2ds(Scan):
                     * stepUnits)
 
             dataSet1, dataSet2 = None, None
+            reverse = self.serpentine and self._reverseNext
 
             if self.continuousScan:
-                dataSet, axis = await self._doContinuousScan(axis)
+                dataSet, axis = await self._doContinuousScan(axis, reverse)
             else:
-                dataSet1, dataSet2 = await self._doSteppedScan(axis)
+                dataSet1, dataSet2 = await self._doSteppedScan(axis, reverse)
+
+            if self.serpentine:
+                self._reverseNext = not self._reverseNext
 
             self._dataSetReady(dataSet1)
             self._dataSetReady(dataSet2)
@@ -400,13 +561,13 @@ class Scan2ds(Scan):
             raise
 
         finally:
+            self._acquisitionDone()
             self._loop.create_task(self.dataSource.stop())
-            self.manipulator.stop()
-            if self.retractAtEnd and axis is not None:
-                self._loop.create_task(
-                    self.manipulator.moveTo(axis[0] - self._getOverscan(axis),
-                                            self.positioningVelocity)
-                )
+            if not self._retracting:
+                self.manipulator.stop()
+            if (self.retractAtEnd and not self.serpentine and
+                    axis is not None):
+                self._retract(axis)
 
             self.set_trait('active', False)
             self._activeFuture = None
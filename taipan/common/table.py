@@ -25,9 +25,75 @@ from traitlets import Bool, Float, Instance, Unicode
 from copy import deepcopy
 from common.traits import Quantity, Path
 from common.units import Q_
+from common.travelplanner import planTableOrder
 import csv
 
 
+def parseMoveOrder(spec, count):
+    """ Parse a move order specification for ``count`` manipulators.
+
+    The specification lists groups of manipulators (numbered from 1),
+    separated by semicolons. The manipulators of a group are separated by
+    commas and move concurrently; the groups move one after another. E.g.
+    ``"1,2;3"`` first moves manipulators 1 and 2 together, then
+    manipulator 3. Manipulators not listed move together in a final group.
+    An empty specification moves all manipulators concurrently.
+
+    Returns
+    -------
+    list of lists
+        The zero-based indices of the manipulators, grouped.
+    """
+    groups = []
+    seen = set()
+
+    for group in spec.split(';'):
+        indices = []
+        for item in group.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            try:
+                index = int(item) - 1
+            except ValueError:
+                raise RuntimeError("Invalid manipulator '{}' in move order "
+                                   "'{}'".format(item, spec))
+            if not 0 <= index < count:
+                raise RuntimeError("No manipulator {} in move order '{}'"
+                                   .format(item, spec))
+            if index in seen:
+                raise RuntimeError("Manipulator {} appears twice in move "
+                                   "order '{}'".format(item, spec))
+            seen.add(index)
+            indices.append(index)
+
+        if indices:
+            groups.append(indices)
+
+    rest = [i for i in range(count) if i not in seen]
+    if rest:
+        groups.append(rest)
+
+    return groups
+
+
+async def moveInGroups(moves, groups):
+    """ Move manipulators group by group, the manipulators of a group
+    concurrently.
+
+    Parameters
+    ----------
+    moves : list of tuples
+        ``(manipulator, target, velocity)`` for each manipulator.
+
+    groups : list of lists
+        Indices into ``moves``, as returned by `parseMoveOrder`.
+    """
+    for group in groups:
+        await asyncio.gather(*(moves[i][0].moveTo(moves[i][1], moves[i][2])
+                               for i in group))
+
+
 class TabularMeasurements(DataSource):
 
     manipulator = Instance(Manipulator, allow_none=True)
@@ -50,6 +116,18 @@ class TabularMeasurements(DataSource):
 
     currentMeasurementName = Unicode(read_only=True).tag(name="Current")
 
+    optimizeOrder = Bool(False, help="Measure the rows in an order which "
+                                     "minimizes the travel time of the "
+                                     "manipulators. The resulting data set "
+                                     "keeps the order of the table file."
+                         ).tag(name="Optimize travel order")
+
+    pinnedRows = Unicode('', help="Rows whose names match this regular "
+                                  "expression are always measured right "
+                                  "before the row following them in the "
+                                  "table file, e.g. '^reference'.").tag(
+        name="Pinned rows")
+
 
     def __init__(self, manipulator: Manipulator=None,
                  dataSource: DataSource=None, objectName: str=None,
@@ -98,13 +176,20 @@ class TabularMeasurements(DataSource):
         self.add_traits(**newTraits)
 
     async def _doSteppedScan(self, names, axis):
-        accumulator = []
+        order = range(len(axis))
+        if self.optimizeOrder:
+            order = await planTableOrder(names, [axis], [self.manipulator],
+                                         [self.positioningVelocity],
+                                         self.pinnedRows)
+
+        # the results are kept in the order of the table file
+        accumulator = [None] * len(axis)
         await self.dataSource.start()
 
-        for i, (name, position) in enumerate(zip(names, axis)):
-            self.set_trait('currentMeasurementName', name)
-            await self.manipulator.moveTo(position, self.positioningVelocity)
-            accumulator.append(await self.dataSource.readDataSet())
+        for i, row in enumerate(order):
+            self.set_trait('currentMeasurementName', names[row])
+            await self.manipulator.moveTo(axis[row], self.positioningVelocity)
+            accumulator[row] = await self.dataSource.readDataSet()
             self.set_trait('progress', (i + 1) / len(axis))
 
         self.set_trait('currentMeasurementName', '')
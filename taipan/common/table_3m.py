@@ -25,6 +25,8 @@ from traitlets import Bool, Float, Instance, Unicode
 from copy import deepcopy
 from common.traits import Quantity, Path
 from common.units import Q_
+from common.table import parseMoveOrder, moveInGroups
+from common.travelplanner import planTableOrder
 import csv
 
 
@@ -64,6 +66,27 @@ class TabularMeasurements3M(DataSource):
 
     currentMeasurementName = Unicode(read_only=True).tag(name="Current")
 
+    moveOrder = Unicode('', help="The order in which the manipulators are "
+                                 "positioned for each row, e.g. '1;2' to "
+                                 "move manipulator 2 only after manipulator "
+                                 "1 has arrived. Manipulators in the same "
+                                 "group (separated by commas) move "
+                                 "together, unlisted ones last. Empty: all "
+                                 "manipulators move together.").tag(
+        name="Move order")
+
+    optimizeOrder = Bool(False, help="Measure the rows in an order which "
+                                     "minimizes the travel time of the "
+                                     "manipulators. The resulting data set "
+                                     "keeps the order of the table file."
+                         ).tag(name="Optimize travel order")
+
+    pinnedRows = Unicode('', help="Rows whose names match this regular "
+                                  "expression are always measured right "
+                                  "before the row following them in the "
+                                  "table file, e.g. '^reference'.").tag(
+        name="Pinned rows")
+
     def __init__(self, manipulator1: Manipulator = None,
                  manipulator2: Manipulator = None,
                  manipulator3: Manipulator = None,
@@ -122,15 +145,29 @@ class TabularMeasurements3M(DataSource):
         self.add_traits(**newTraits)
 
     async def _doSteppedScan(self, names, axis1, axis2, axis3):
-        accumulator = []
+        groups = parseMoveOrder(self.moveOrder, 3)
+
+        order = range(len(axis1))
+        if self.optimizeOrder:
+            order = await planTableOrder(
+                names, [axis1, axis2, axis3],
+                [self.manipulator1, self.manipulator2, self.manipulator3],
+                [self.positioningVelocityM1, self.positioningVelocityM2,
+                 self.positioningVelocityM3],
+                self.pinnedRows, groups)
+
+        # the results are kept in the order of the table file
+        accumulator = [None] * len(axis1)
         await self.dataSource.start()
 
-        for i, (name, position1, position2, position3) in enumerate(zip(names, axis1, axis2, axis3)):
-            self.set_trait('currentMeasurementName', name)
-            await self.manipulator1.moveTo(position1, self.positioningVelocityM1)
-            await self.manipulator2.moveTo(position2, self.positioningVelocityM2)
-            await self.manipulator3.moveTo(position3, self.positioningVelocityM3)
-            accumulator.append(await self.dataSource.readDataSet())
+        for i, row in enumerate(order):
+            self.set_trait('currentMeasurementName', names[row])
+            await moveInGroups(
+                [(self.manipulator1, axis1[row], self.positioningVelocityM1),
+                 (self.manipulator2, axis2[row], self.positioningVelocityM2),
+                 (self.manipulator3, axis3[row], self.positioningVelocityM3)],
+                groups)
+            accumulator[row] = await self.dataSource.readDataSet()
             self.set_trait('progress', (i + 1) / len(axis1))
 
         self.set_trait('currentMeasurementName', '')
@@ -204,9 +241,9 @@ class TabularMeasurements3M(DataSource):
 
         try:
             await self.dataSource.stop()
-            await self.manipulator1.waitForTargetReached()
-            await self.manipulator2.waitForTargetReached()
-            await self.manipulator3.waitForTargetReached()
+            await asyncio.gather(self.manipulator1.waitForTargetReached(),
+                                 self.manipulator2.waitForTargetReached(),
+                                 self.manipulator3.waitForTargetReached())
 
             dataSet = await self._doSteppedScan(names, axis1, axis2, axis3)
 
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of Taipan.
+
+Taipan is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Taipan is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import logging
+import re
+import numpy as np
+from functools import partial
+from pint.errors import DimensionalityError
+from common.units import ureg
+
+
+def pinnedBlocks(names, pattern=None):
+    """ Split table rows into blocks which have to be measured consecutively
+    and in file order.
+
+    Every row whose name matches the regular expression ``pattern`` is
+    pinned to the row following it, e.g. ``'^reference'`` measures each
+    reference immediately before the sample after it.
+
+    Returns
+    -------
+    list of lists
+        The row indices of each block.
+    """
+    regex = re.compile(pattern) if pattern else None
+
+    blocks = []
+    current = []
+    for i, name in enumerate(names):
+        current.append(i)
+        if regex is None or not regex.search(name):
+            blocks.append(current)
+            current = []
+
+    if current:
+        blocks.append(current)
+
+    return blocks
+
+
+def _travelTimes(origins, targets, velocities, groups):
+    """ The travel times from each origin to each target, as a matrix. The
+    axes of a group move concurrently, the groups one after another. """
+    with np.errstate(divide='ignore'):
+        times = (np.abs(origins[:, None, :] - targets[None, :, :]) /
+                 velocities[None, None, :])
+    return sum(times[:, :, group].max(axis=2) for group in groups)
+
+
+def planTravelOrder(positions, velocities, start=None, blocks=None,
+                    groups=None, maxPasses=100):
+    """ Find a short order in which to visit the given positions.
+
+    The order is built by a nearest neighbour search starting at ``start``
+    and then improved by 2-opt moves until no move improves it any further
+    (or ``maxPasses`` passes are done). The path is open, i.e. does not
+    return to ``start``.
+
+    Parameters
+    ----------
+    positions : array_like
+        The positions of the rows, shape ``(rows, axes)``.
+
+    velocities : array_like
+        The velocity of each axis, in units of the positions per second. For
+        axes with a velocity which is not positive, the distance is
+        optimized instead.
+
+    start : array_like, optional
+        The current position. Default: the position of the first row.
+
+    blocks : list of lists, optional
+        Rows which have to be visited consecutively in the given order, see
+        `pinnedBlocks`. Default: every row on its own.
+
+    groups : list of lists, optional
+        Axes which move concurrently, see `common.table.parseMoveOrder`.
+        Default: all axes move concurrently.
+
+    Returns
+    -------
+    list of int
+        The row indices in the order in which they should be visited.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if positions.ndim == 1:
+        positions = positions[:, None]
+
+    velocities = np.broadcast_to(np.asarray(velocities, dtype=float),
+                                 positions.shape[1:])
+    # no idea about the velocity: optimize the distance instead
+    velocities = np.where(velocities > 0, velocities, 1.0)
+
+    if blocks is None:
+        blocks = [[i] for i in range(len(positions))]
+    if groups is None:
+        groups = [list(range(positions.shape[1]))]
+    if start is None:
+        start = positions[blocks[0][0]] if blocks else positions[0]
+
+    m = len(blocks)
+    if m < 2:
+        return [row for block in blocks for row in block]
+
+    # node 0 is the start position, node b + 1 is block b
+    entries = np.array([positions[block[0]] for block in blocks])
+    exits = np.array([np.asarray(start, dtype=float)] +
+                     [positions[block[-1]] for block in blocks])
+
+    # the start is never entered, its column stays zero
+    cost = np.zeros((m + 1, m + 1))
+    cost[:, 1:] = _travelTimes(exits, entries, velocities, groups)
+    # e.g. positions which are not a number
+    cost[np.isnan(cost)] = np.inf
+
+    # nearest neighbour
+    tour = [0]
+    unvisited = list(range(1, m + 1))
+    for _ in range(m):
+        nxt = unvisited[int(np.argmin(cost[tour[-1], unvisited]))]
+        tour.append(nxt)
+        unvisited.remove(nxt)
+
+    # 2-opt. The costs are asymmetric (entry and exit of a block differ), so
+    # reversing a segment changes its inner cost as well; keep prefix sums of
+    # the forward and backward costs along the tour.
+    def prefixCosts(tour):
+        t = np.array(tour)
+        forward = np.concatenate(([0.], np.cumsum(cost[t[:-1], t[1:]])))
+        backward = np.concatenate(([0.], np.cumsum(cost[t[1:], t[:-1]])))
+        return t, forward, backward
+
+    # moves between infinite costs give NaN deltas and are never taken
+    with np.errstate(invalid='ignore'):
+        for _ in range(maxPasses):
+            t, forward, backward = prefixCosts(tour)
+
+            improved = False
+            for i in range(1, m):
+                for k in range(i + 1, m + 1):
+                    delta = (cost[t[i - 1], t[k]] - cost[t[i - 1], t[i]] +
+                             (backward[k] - backward[i]) -
+                             (forward[k] - forward[i]))
+                    if k < m:
+                        delta += cost[t[i], t[k + 1]] - cost[t[k], t[k + 1]]
+
+                    if delta < -1e-9:
+                        tour[i:k + 1] = tour[i:k + 1][::-1]
+                        t, forward, backward = prefixCosts(tour)
+                        improved = True
+
+            if not improved:
+                break
+
+    return [row for node in tour[1:] for row in blocks[node - 1]]
+
+
+async def planTableOrder(names, axes, manipulators, velocities,
+                         pinnedRows='', groups=None):
+    """ Plan the order of the rows of a tabular measurement.
+
+    The search runs in the default executor of the event loop, so that it
+    does not block the loop for large tables. If it fails to produce an
+    order visiting every row exactly once, the order of the table file is
+    used.
+
+    Parameters
+    ----------
+    names : list of str
+        The names of the rows.
+
+    axes : list
+        For each manipulator, the list of target positions of all rows.
+
+    manipulators : list of Manipulator
+        The manipulators, their current positions are the starting point.
+
+    velocities : list of Quantity
+        The positioning velocity of each manipulator.
+
+    pinnedRows : str
+        A regular expression, see `pinnedBlocks`.
+
+    groups : list of lists, optional
+        See `planTravelOrder`.
+
+    Returns
+    -------
+    list of int
+        The row indices in the order in which they should be measured.
+    """
+    positions = []
+    start = []
+    speeds = []
+
+    for axis, manipulator, velocity in zip(axes, manipulators, velocities):
+        units = manipulator.trait_metadata('value', 'preferred_units')
+        positions.append([pos.to(units).magnitude for pos in axis])
+        start.append(manipulator.value.to(units).magnitude)
+        try:
+            speeds.append(velocity.to(units / ureg.s).magnitude)
+        except DimensionalityError:
+            # no idea about the velocity: optimize the distance instead
+            speeds.append(1.0)
+
+    fileOrder = list(range(len(names)))
+    try:
+        order = await asyncio.get_event_loop().run_in_executor(
+            None, partial(planTravelOrder, np.array(positions).T, speeds,
+                          start, pinnedBlocks(names, pinnedRows), groups))
+    except Exception:
+        logging.exception("Failed to optimize the order of the rows, "
+                          "measuring them in the order of the table file")
+        return fileOrder
+
+    if sorted(order) != fileOrder:
+        logging.warning("The optimized order of the rows is invalid, "
+                        "measuring them in the order of the table file")
+        return fileOrder
+
+    return order
@@ -19,9 +19,13 @@ along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 from serial_asyncio import SerialTransport, create_serial_connection
+from common import DataSource, DataSet, Q_, action
+from common.traits import DataSet as DataSetTrait
+from traitlets import Int
 import numpy as np
 import asyncio
 import binascii
+import logging
 import struct
 import enum
 from collections import deque
@@ -171,6 +175,39 @@ class GeneratorMode(enum.Enum):
     Clock = 3
 
 
+class StreamDecoder:
+    """
+    Cuts the raw sample stream of a streaming capture into blocks of
+    ``blockSize`` 8 bit samples. Every completed block is passed to
+    ``callback`` as a `numpy.ndarray` of dtype uint8, which is owned by the
+    callback from then on.
+    """
+
+    def __init__(self, blockSize, callback):
+        self.blockSize = blockSize
+        self.callback = callback
+        self._block = np.empty(blockSize, dtype=np.uint8)
+        self._fill = 0
+
+    def feed(self, data):
+        data = np.frombuffer(data, dtype=np.uint8)
+        pos = 0
+        while pos < len(data):
+            n = min(len(data) - pos, self.blockSize - self._fill)
+            self._block[self._fill:self._fill + n] = data[pos:pos + n]
+            self._fill += n
+            pos += n
+
+            if self._fill == self.blockSize:
+                block = self._block
+                self._block = np.empty(self.blockSize, dtype=np.uint8)
+                self._fill = 0
+                self.callback(block)
+
+    def reset(self):
+        self._fill = 0
+
+
 class BitScope(asyncio.Protocol):
 
     def __init__(self, loop=None):
@@ -181,9 +218,10 @@ class BitScope(asyncio.Protocol):
         self._loop = loop
         self.transport = None
 
-        self._buffer = b''
+        self._buffer = bytearray()
         self._queue = deque()
         self._callbacks = []
+        self._resetting = False
 
     def add_data_callback(self, cb):
         self._callbacks.append(cb)
@@ -199,25 +237,61 @@ class BitScope(asyncio.Protocol):
         self.transport = transport
         self.guarded_write(b'!')
 
+    def _forward(self, data):
+        for cb in self._callbacks:
+            cb(data)
+
     def data_received(self, data):
+        if self._resetting:
+            self._buffer += data
+            return
+
         if not self._queue:
-            for cb in self._callbacks:
-                cb(data)
+            self._forward(data)
             return
 
         self._buffer += data
 
-        while self._queue and self._buffer.startswith(self._queue[0][0]):
-            bytes, fut = self._queue.popleft()
-            self._buffer = self._buffer[len(bytes):]
-            fut.set_result(None)
+        # match the echoes of the written commands
+        consumed = 0
+        while self._queue:
+            expected, fut = self._queue[0]
+            available = len(self._buffer) - consumed
+            n = min(available, len(expected))
+            received = self._buffer[consumed:consumed + n]
+
+            if received != expected[:n]:
+                self._queue.popleft()
+                if not fut.done():
+                    fut.set_exception(RuntimeError(
+                        "Unexpected reply from BitScope: expected {}, got {}"
+                        .format(expected, bytes(received))))
+                consumed += n
+                continue
+
+            if n < len(expected):
+                break
+
+            self._queue.popleft()
+            consumed += n
+            if not fut.done():
+                fut.set_result(None)
+
+        if consumed:
+            del self._buffer[:consumed]
+
+        # anything following the last echo is capture data
+        if not self._queue and self._buffer:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self._forward(data)
 
     def connection_lost(self, exc):
         for (bytes, fut) in self._queue:
             fut.cancel()
 
         self._queue.clear()
-        self._buffer = b''
+        self._buffer.clear()
 
     async def triggeredCapture(self):
         await self.guarded_write(b">")
@@ -230,13 +304,22 @@ class BitScope(asyncio.Protocol):
         await self.guarded_write(b"T")
 
     async def reset(self):
-        fut = self.guarded_write(b'!')
-        await asyncio.sleep(0.1)
-        if not self._buffer.endswith(b'!'):
-            raise RuntimeError("Bitscope failed to reset!")
-        self._buffer = b''
-        fut.set_result(None)
+        # the reset also terminates a running capture, so its echo may be
+        # preceded by capture data and cannot go through the echo matcher
+        for (bytes, fut) in self._queue:
+            fut.cancel()
         self._queue.clear()
+        self._buffer.clear()
+
+        self._resetting = True
+        try:
+            self.transport.write(b'!')
+            await asyncio.sleep(0.1)
+            if not self._buffer.endswith(b'!'):
+                raise RuntimeError("Bitscope failed to reset!")
+        finally:
+            self._resetting = False
+            self._buffer.clear()
 
     def guarded_write(self, toWrite):
         fut = self._loop.create_future()
@@ -260,3 +343,87 @@ class BitScope(asyncio.Protocol):
 
         return self.guarded_write(toWrite)
 
+
+class BitScopeSource(DataSource):
+    """
+    A BitScope as a streaming DataSource.
+
+    While started, the sample stream of a streaming capture is cut into blocks
+    of ``blockSize`` samples. Every block is published in ``currentData``;
+    `readDataSet` returns the next complete block. The samples are the raw 8
+    bit converter values.
+    """
+
+    blockSize = Int(4096, min=1).tag(name="Block size")
+    blocksReceived = Int(0, read_only=True).tag(name="Blocks received")
+
+    currentData = DataSetTrait(read_only=True).tag(name="Live data",
+                                                   data_label="Amplitude",
+                                                   axes_labels=["Sample"])
+
+    def __init__(self, port, baudrate=115200, objectName=None, loop=None):
+        super().__init__(objectName=objectName, loop=loop)
+        self.port = port
+        self.baudrate = baudrate
+        self.scope = None
+        self._transport = None
+        self._decoder = None
+        self._pendingFutures = []
+
+    async def __aenter__(self):
+        await super().__aenter__()
+        self._transport, self.scope = await create_serial_connection(
+            self._loop, lambda: BitScope(self._loop), self.port,
+            baudrate=self.baudrate)
+        self.scope.add_data_callback(self._dataReceived)
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+        self._transport.close()
+        await super().__aexit__(*args)
+
+    def _dataReceived(self, data):
+        if self._decoder is not None:
+            self._decoder.feed(data)
+
+    def _blockReady(self, block):
+        axis = Q_(np.arange(len(block)))
+        dataSet = DataSet(Q_(block.astype(np.float64)), [axis])
+        self.set_trait('currentData', dataSet)
+        self.set_trait('blocksReceived', self.blocksReceived + 1)
+
+        futures, self._pendingFutures = self._pendingFutures, []
+        for fut in futures:
+            if not fut.done():
+                fut.set_result(dataSet)
+
+    @action("Start")
+    async def start(self):
+        if self._decoder is not None:
+            return
+
+        self.set_trait('blocksReceived', 0)
+        self._decoder = StreamDecoder(self.blockSize, self._blockReady)
+        await self.scope.streamingCapture()
+
+    @action("Stop")
+    async def stop(self):
+        if self._decoder is None:
+            return
+
+        self._decoder = None
+        try:
+            await self.scope.reset()
+        except RuntimeError:
+            logging.warning("BitScope did not acknowledge the reset")
+
+    async def readDataSet(self):
+        if self._decoder is None:
+            raise RuntimeError("Start the BitScope before reading data!")
+
+        fut = self._loop.create_future()
+        self._pendingFutures.append(fut)
+        dataSet = await fut
+        self._dataSetReady(dataSet)
+        return dataSet
@@ -27,6 +27,7 @@ from common.traits import DataSet as DataSetTrait, Quantity as QuantityTrait
 import PyDAQmx as mx
 import logging
 import time
+from collections import deque
 
 
 class NIDAQ(DataSource):
@@ -45,6 +46,17 @@ class NIDAQ(DataSource):
     voltageMin = QuantityTrait(Q_(-10,'V'))
     voltageMax = QuantityTrait(Q_(10,'V'))
 
+    droppedSamples = traitlets.Int(0, read_only=True).tag(
+        name="Dropped samples")
+    overflows = traitlets.Int(0, read_only=True).tag(
+        name="Buffer overflows")
+
+    minimumWakeupInterval = QuantityTrait(Q_(20, 'ms'), min=Q_(0, 'ms')).tag(
+        name="Minimum wakeup interval")
+
+    # DAQmxErrorSamplesNoLongerAvailable
+    _overflowErrorCode = -200279
+
     def __init__(self, objectName=None, loop=None):
         super().__init__(objectName=objectName, loop=loop)
 
@@ -53,10 +65,22 @@ class NIDAQ(DataSource):
 
         self.readEveryN = 100
 
+        # the number of completed chunks that may wait for the event loop
+        # before samples are dropped
+        self.maxPendingChunks = 64
+
         self.currentTask = None
 
-        self._buf = None
-        self._cumBuf = np.zeros(0)
+        # owned by the DAQmx callback thread while the task is running
+        self._scratch = None
+        self._assembly = None
+        self._fill = 0
+        self._droppedInCallback = 0
+
+        # hand-off from the callback thread to the event loop
+        self._completedChunks = deque()
+        self._wakeupPending = False
+        self._lastWakeup = 0
 
         self._axis = None
 
@@ -67,51 +91,105 @@ class NIDAQ(DataSource):
         self._lastTime = 0
 
     def _everyNCallback(self):
+        # This is called from the DAQmx thread. The samples are read directly
+        # into the assembly buffer; completed chunks are handed to the event
+        # loop through a deque, waking it at most once per
+        # minimumWakeupInterval. Nothing here ever waits for the event loop.
+        try:
+            remaining = self.readEveryN
+            while remaining > 0:
+                if len(self._completedChunks) >= self.maxPendingChunks:
+                    # the event loop is too far behind. The samples still have
+                    # to be read out of the DAQmx buffer to prevent an
+                    # overflow, but they are dropped.
+                    self._droppedInCallback += self._read(self._scratch,
+                                                          remaining)
+                    self._requestWakeup()
+                    return 0
+
+                n = min(remaining, self.chunkSize - self._fill)
+                read = self._read(self._assembly[self._fill:self._fill + n], n)
+                self._fill += read
+                remaining -= n
+
+                if self._fill == self.chunkSize:
+                    self._completedChunks.append((self._assembly, self._axis))
+                    self._assembly = np.empty(self.chunkSize)
+                    self._fill = 0
+                    self._requestWakeup()
+
+                if read < n:
+                    break
+        except mx.DAQError as e:
+            self._loop.call_soon_threadsafe(self._handleReadError, e)
+
+        return 0
+
+    def _read(self, target, count):
         read = mx.int32()
-        self.currentTask.ReadAnalogF64(self.readEveryN, 0,  # timeout
+        self.currentTask.ReadAnalogF64(count, 0,  # timeout
                                        mx.DAQmx_Val_GroupByScanNumber,
-                                       self._buf, self._buf.size,
+                                       target, count,
                                        mx.byref(read), None)
+        return read.value
+
+    def _requestWakeup(self):
+        if self._wakeupPending:
+            return
+
+        self._wakeupPending = True
+        delay = (self._lastWakeup - time.perf_counter() +
+                 self.minimumWakeupInterval.to('s').magnitude)
+        if delay > 0:
+            self._loop.call_soon_threadsafe(self._loop.call_later, delay,
+                                            self._deliverChunks)
+        else:
+            self._loop.call_soon_threadsafe(self._deliverChunks)
 
-        # this callback is called from another thread, so we'll post a queued
-        # call to the event loop
-        chunk = self._buf.copy()
-        self._loop.call_soon_threadsafe(lambda: self._handleNewChunk(chunk))
-
-        return 0
+    def _handleReadError(self, error):
+        if getattr(error, 'error', None) == self._overflowErrorCode:
+            self.set_trait('overflows', self.overflows + 1)
+        logging.error("NIDAQ: Failed to read samples: {}".format(error))
 
     def _taskDone(self, status):
         self.stop()
         return 0
 
-    def _handleNewChunk(self, chunk):
-        self._cumBuf = np.concatenate((self._cumBuf, chunk))
+    def _deliverChunks(self):
+        # reset the flag before draining, so that chunks completed while
+        # draining request a new wakeup
+        self._wakeupPending = False
+        self._lastWakeup = time.perf_counter()
 
-        while len(self._cumBuf) >= self.chunkSize:
-            properChunk = self._cumBuf[:self.chunkSize].copy()
-            self._cumBuf = self._cumBuf[self.chunkSize:].copy()
+        dropped = self._droppedInCallback
+        if dropped != self.droppedSamples:
+            self.set_trait('droppedSamples', dropped)
 
-            if self._axis is None:
-                axis = Q_(np.arange(len(properChunk)))
-            else:
-                axis = self._axis.copy()
+        while self._completedChunks:
+            self._emitChunk(*self._completedChunks.popleft())
 
-            properChunk = Q_(properChunk, 'V')
-            dataSet = DataSet(properChunk, [ axis ])
-            self.set_trait('currentDataSet', dataSet)
+    def _emitChunk(self, properChunk, axis):
+        if axis is None:
+            axis = Q_(np.arange(len(properChunk)))
+        else:
+            axis = axis.copy()
 
-            cur = time.perf_counter()
-            rate = 1.0 / (cur - self._lastTime)
-            self.set_trait('dataRate', Q_(rate, 'Hz'))
-            self._lastTime = cur
+        properChunk = Q_(properChunk, 'V')
+        dataSet = DataSet(properChunk, [ axis ])
+        self.set_trait('currentDataSet', dataSet)
 
-            self._chunkReady(dataSet)
+        cur = time.perf_counter()
+        rate = 1.0 / (cur - self._lastTime)
+        self.set_trait('dataRate', Q_(rate, 'Hz'))
+        self._lastTime = cur
+
+        self._chunkReady(dataSet)
 
-            for fut in self.__pendingFutures:
-                if not fut.done():
-                    fut.set_result(dataSet)
+        for fut in self.__pendingFutures:
+            if not fut.done():
+                fut.set_result(dataSet)
 
-            self.__pendingFutures = []
+        self.__pendingFutures = []
 
     @action('Start task')
     async def start(self, scanAxis=None):
@@ -122,7 +200,14 @@ class NIDAQ(DataSource):
             self.chunkSize = len(scanAxis)
             self._axis = scanAxis
 
-        self._buf = np.zeros(self.readEveryN)
+        self._scratch = np.empty(self.readEveryN)
+        self._assembly = np.empty(self.chunkSize)
+        self._fill = 0
+        self._droppedInCallback = 0
+        self._completedChunks.clear()
+        self.set_trait('droppedSamples', 0)
+        self.set_trait('overflows', 0)
+
         self.currentTask = mx.Task()
         self.currentTask.EveryNCallback = self._everyNCallback
         self.currentTask.DoneCallback = self._taskDone
@@ -150,7 +235,12 @@ class NIDAQ(DataSource):
             self.currentTask.ClearTask()
             self.currentTask = None
             self.set_trait("active", False)
-            self._cumBuf = np.zeros(0)
+            # The callback thread is gone, deliver what it has completed.
+            # Deliver from the event loop, so that a readDataSet following
+            # stop() still receives the last chunk.
+            self._loop.call_soon(self._deliverChunks)
+            self._assembly = None
+            self._fill = 0
             self._axis = None
             logging.info("Task stopped.")
 
@@ -350,6 +350,13 @@ class SR7230(DataSource):
         group='Data Curve Buffer')
     pointsAcquired = traitlets.Int(default_value=0, read_only=True).tag(name="Points Acquired",
                                                                         group='Data Curve Buffer')
+    binaryTransfer = traitlets.Bool(default_value=False,
+                                    help="Read the data buffer with the binary DCB dump instead of the ASCII DC "
+                                         "command. The transfer over serial and GPIB links has not been verified "
+                                         "yet.").tag(
+                                        name="Binary Buffer Transfer", group='Data Curve Buffer')
+    transferChunkSize = traitlets.Int(default_value=20000, min=2).tag(name="Transfer Chunk Size (Bytes)",
+                                                                      group='Data Curve Buffer')
 
     # Status Traitlets
 
@@ -728,20 +735,65 @@ class SR7230(DataSource):
 
         return float(await self.query(channel))
 
+    @threaded_async
+    def readBinaryCurve(self, numberOfPoints, curve=0):
+        """
+        Reads a curve from the device's data buffer using the binary dump command `DCB`.
+
+        Every point is transferred as a big-endian 16 bit signed integer, which is the same integer representation
+        the ASCII `DC` command returns. The data is read in chunks of `transferChunkSize` bytes directly into a
+        preallocated buffer.
+
+        Parameters
+        ----------
+        numberOfPoints : int
+            The number of points stored in the curve buffer.
+        curve : int
+            The curve to read.
+
+        Returns
+        -------
+        numpy.ndarray
+            the read data points.
+        """
+
+        buffer = bytearray(2 * numberOfPoints)
+        view = memoryview(buffer)
+
+        with self._lock:
+            logging.info('{}: DCB {}'.format(self, curve))
+            self.resource.write('DCB {}'.format(curve))
+
+            received = 0
+            while received < len(buffer):
+                chunk = self.resource.read_bytes(min(self.transferChunkSize, len(buffer) - received))
+                view[received:received + len(chunk)] = chunk
+                received += len(chunk)
+
+            # like in query(), the status bytes are only sent separately over ethernet
+            if self.ethernet:
+                self.resource.read_raw()
+
+        return np.frombuffer(buffer, dtype='>i2').astype(np.float64)
+
     async def readDataBuffer(self):
         """
         Reads the data buffer of the device
 
         Returns
         -------
-        list
-            a list of the read data points from the device's data buffer.
+        numpy.ndarray
+            the read data points from the device's data buffer.
         """
 
-        numberOfPoints = await self.getNumberOfPointsAcquired()
+        numberOfPoints = int(await self.getNumberOfPointsAcquired())
         print('number of points: ' + str(numberOfPoints))
         if numberOfPoints == 0:
-            return []
+            return np.array([])
+
+        if self.binaryTransfer:
+            return await self.readBinaryCurve(numberOfPoints)
+
         data = await self.query('DC 0')
         data = data[0]
 
@@ -753,7 +805,7 @@ class SR7230(DataSource):
             except ValueError:
                 pass
 
-        return result
+        return np.array(result)
 
     async def readDataSet(self):
         if self.samplingMode == SR7230.SamplingMode.SingleShot:
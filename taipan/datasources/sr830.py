@@ -25,7 +25,6 @@ from asyncioext import threaded_async, ensure_weakly_binding_future
 from threading import Lock
 import asyncio
 from pyvisa import constants
-import struct
 import enum
 import traitlets
 import logging
@@ -221,6 +220,13 @@ class SR830(DataSource):
     sampleRate = traitlets.Enum(SampleRate, SampleRate.Rate_512_Hz)
     sampleRate.tag(command='SRAT')
 
+    streamingReadout = traitlets.Bool(False).tag(
+                        name="Streaming readout", group='Data Buffer')
+    drainInterval = Quantity(Q_(250, 'ms'), min=Q_(10, 'ms')).tag(
+                        name="Drain interval", group='Data Buffer')
+    pointsDrained = traitlets.Integer(0, read_only=True).tag(
+                        name="Points read", group='Data Buffer')
+
 #    REFERENCE and PHASE Commands
     referencePhase = Quantity(Q_(0, 'deg'), min=Q_(-360.0, 'deg'),
                               max=Q_(729.99, 'deg'), read_only=False)
@@ -351,6 +357,9 @@ class SR830(DataSource):
         self.observe(self.setParameter, traitlets.All)
         self._traitChangesDueToStatusUpdate = True
         self._lock = Lock()
+        self._drainFuture = None
+        self._drainStopEvent = None
+        self._drainedChunks = []
         self._statusUpdateFuture = ensure_weakly_binding_future(
                                                     self.contStatusUpdate)
 
@@ -373,6 +382,7 @@ class SR830(DataSource):
 
     async def __aexit__(self, *args):
         await super().__aexit__(*args)
+        await self._stopDraining()
         self._statusUpdateFuture.cancel()
 
     @threaded_async
@@ -400,11 +410,20 @@ class SR830(DataSource):
     @action("Start")
     async def start(self):
         if (self.samplingMode == SR830.SamplingMode.Buffered):
+            await self._stopDraining()
+            self._drainedChunks = []
+            self.set_trait('pointsDrained', 0)
+
             await self.write('REST')
 #           Only for triggered STRT ist neccessary
             if self.sampleRate == SR830.SampleRate.Trigger:
                 await self.write('STRT')
 
+            if self.streamingReadout:
+                self._drainStopEvent = asyncio.Event()
+                self._drainFuture = ensure_weakly_binding_future(
+                                                        self._drainBuffer)
+
     @action("Stop")
     async def stop(self):
         await self.write('PAUS')
@@ -554,14 +573,14 @@ class SR830(DataSource):
         asyncio.ensure_future(self.write('RSET %d' % val))
         asyncio.ensure_future(self.readAllParameters())
 
+    _internalFormat = np.dtype([('mantissa', '<i2'), ('exponent', 'u1'),
+                                ('reserved', 'u1')])
+
     @staticmethod
     def _internal2float(data):
-        ret = []
-        for i in range(0, len(data), 4):
-            m, = struct.unpack('<h', data[i:i+2])
-            exp = data[i+2]
-            ret.append(m * 2**(exp - 124))
-        return ret
+        points = np.frombuffer(data, dtype=SR830._internalFormat)
+        return np.ldexp(points['mantissa'].astype(np.float64),
+                        points['exponent'].astype(np.int32) - 124)
 
     @threaded_async
     def _readExactly(self, size):
@@ -581,15 +600,12 @@ class SR830(DataSource):
             self.resource.read_termination = prev_read_termination
         return data
 
-    async def readDataBuffer(self):
-        nPts = int(await self.query('SPTS?'))
-        if nPts == 0:
-            return []
+    async def _readBufferRange(self, start, nPts):
         with self._lock:
             if (self._isDualChannel):
-                await self.write('TRCL? 1,0,%d' % nPts, lock=False)
+                await self.write('TRCL? 1,%d,%d' % (start, nPts), lock=False)
             else:
-                await self.write('TRCL? 0,%d' % nPts, lock=False)
+                await self.write('TRCL? %d,%d' % (start, nPts), lock=False)
 
             data, s = await self._readExactly(nPts * 4)
         if (s != constants.StatusCode.success_max_count_read and
@@ -599,6 +615,54 @@ class SR830(DataSource):
                             (len(data), nPts * 4))
         return SR830._internal2float(data)
 
+    async def _drainNewPoints(self):
+        """Read the points stored since the last drain."""
+        nPts = int(await self.query('SPTS?'))
+        if nPts > self.pointsDrained:
+            chunk = await self._readBufferRange(self.pointsDrained,
+                                                nPts - self.pointsDrained)
+            self._drainedChunks.append(chunk)
+            self.set_trait('pointsDrained', self.pointsDrained + len(chunk))
+
+    async def _drainBuffer(self):
+        """
+        Periodically read the newly stored points while the acquisition is
+        running, so that only the tail is left when the data set is read.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._drainStopEvent.wait(),
+                                       self.drainInterval.to('s').magnitude)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            await self._drainNewPoints()
+
+    async def _stopDraining(self):
+        if self._drainFuture is None:
+            return
+
+        self._drainStopEvent.set()
+        try:
+            await self._drainFuture
+        except Exception:
+            logging.exception('SR830: Draining the data buffer failed')
+        self._drainFuture = None
+
+    async def readDataBuffer(self):
+        if self._drainFuture is not None:
+            await self._stopDraining()
+            await self._drainNewPoints()
+            if not self._drainedChunks:
+                return np.array([])
+            return np.concatenate(self._drainedChunks)
+
+        nPts = int(await self.query('SPTS?'))
+        if nPts == 0:
+            return np.array([])
+        return await self._readBufferRange(0, nPts)
+
     async def readCurrentOutput(self, channel='X'):
         try:
             idx = ['x', 'y', 'r', 'theta'].index(channel.lower()) + 1
@@ -20,17 +20,18 @@ along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
 
 import asyncio
 from common import DataSet, DataSource, Q_, action
-from asyncioext import ensure_weakly_binding_future
+from asyncioext import ensure_weakly_binding_future, read_queue_batches
 from thirdparty.aioserial.aioserial import create_serial_connection
 from threading import Lock
 import re
 #from serial import aio as aioserial
-from serial.threaded import Packetizer, LineReader
+from serial.threaded import LineReader
 import logging
 from traitlets import Bool, Enum, Int, observe
 import enum
+import itertools
 from multiprocessing import Process, Queue
-import struct
+from util.pulsering import PulseRingBuffer, PulseOverrun, slotLengthFor
 import binascii
 import numpy as np
 from common.traits import DataSet as DataSetTrait, Quantity
@@ -39,34 +40,81 @@ import time
 _replyExpression = re.compile(r'([a-zA-Z0-9]+)=\s*(-?[0-9]+)')
 
 
-class PulseReader(Packetizer):
-    TERMINATOR = b'\r'
+class PulseReader(asyncio.Protocol):
+    """
+    Splits the data stream of the pulse port into pulses.
 
-    pulse = b''
+    A pulse is transmitted as hex encoded big-endian 16 bit integers, spread
+    over several ``\r`` terminated lines and terminated by ``X`` or ``Y``.
+    Every pulse is decoded into the next slot of ``ring``. The sequence
+    numbers of all pulses completed by a single read are put into ``q`` as one
+    list. Pulses which have to be discarded still use up a sequence number, so
+    the consumer can count them from the gaps.
+    """
 
-    def __init__(self, q):
+    TERMINATOR = re.compile(b'[XY]')
+
+    def __init__(self, q, ring):
         super().__init__()
         self.q = q
+        self.ring = ring
+        self.buffer = bytearray()
+        # everything before this offset is known to contain no terminator
+        self._scanned = 0
+
+    def data_received(self, data):
+        self.buffer += data
+
+        sequenceNumbers = []
+        # the start of the first pulse which has not been handled yet
+        begin = 0
+        try:
+            match = self.TERMINATOR.search(self.buffer, self._scanned)
+            while match is not None:
+                end = match.start()
+                seq = self.handle_hex_pulse(self.buffer[begin:end])
+                if seq is not None:
+                    sequenceNumbers.append(seq)
+                begin = end + 1
+                match = self.TERMINATOR.search(self.buffer, begin)
+        finally:
+            # drop all handled pulses at once, even if one of them failed
+            del self.buffer[:begin]
+            self._scanned = len(self.buffer)
 
-    def handle_packet(self, packet):
-        self.pulse += packet
-        if self.pulse.endswith(b'X') or self.pulse.endswith(b'Y'):
-            self.handle_hex_pulse(self.pulse[:-1])
-            self.pulse = b''
+            if sequenceNumbers:
+                self.q.put(sequenceNumbers)
 
     def handle_hex_pulse(self, hexPulse):
-        rawPulse = binascii.a2b_hex(hexPulse)
-        pulse = struct.unpack('>{}h'.format(int(len(rawPulse) / 2)), rawPulse)
-        pulse = np.array(pulse, dtype=float)
-        self.q.put(pulse)
+        try:
+            rawPulse = binascii.a2b_hex(hexPulse.replace(b'\r', b''))
+            pulse = np.frombuffer(rawPulse, dtype='>i2')
+        except ValueError:
+            # binascii.Error is a ValueError as well
+            logging.warning("Corrupted pulse received!")
+            # counted as dropped by the consumer
+            self.ring.skip()
+            return None
+
+        try:
+            self.ring.reserve(len(pulse))[:] = pulse
+        except ValueError as e:
+            logging.error("Dropping pulse: {}".format(e))
+            self.ring.skip()
+            return None
 
+        return self.ring.commit()
 
-def read_pulse_data(port, q):
+
+def read_pulse_data(port, q, ring):
     loop = asyncio.new_event_loop()
-    coro = create_serial_connection(loop, lambda: PulseReader(q),
+    coro = create_serial_connection(loop, lambda: PulseReader(q, ring),
                                               port, baudrate=115200)
-    loop.run_until_complete(coro)
-    loop.run_forever()
+    try:
+        loop.run_until_complete(coro)
+        loop.run_forever()
+    except Exception:
+        logging.exception("TEMFiberStretcher: Data reader failed")
 
 
 _dt = 4.36968965E-15 * 1e12
@@ -113,6 +161,15 @@ class TEMFiberStretcher(DataSource):
     measurementRate = Quantity(Q_(0, 'Hz'), read_only=True).tag(
         name="Rate",
         group="Data acquisition")
+    droppedPulses = Int(0, read_only=True).tag(
+        name="Dropped pulses",
+        group="Data acquisition")
+    pulseBufferSlots = Int(64, min=2, help="The number of pulses buffered "
+                                           "between the data reader process "
+                                           "and the event loop. Changing it "
+                                           "restarts the reader.").tag(
+        name="Pulse buffer slots",
+        group="Data acquisition")
     recStart = Quantity(Q_(0, 'ps')).tag(name="Start",
                                          i2q=_counts2ps, q2i=_ps2counts,
                                          priority=0, group="Data acquisition")
@@ -165,6 +222,7 @@ class TEMFiberStretcher(DataSource):
         self.handlers.append(self.update_handler)
 
         self.newDataReady = asyncio.Future()
+        self._pulseRing = None
 
     _traitVars = ['recStart', 'recStop', 'average', 'mScanEnable', 'mTarget',
                   'mSpeedMax', 'mSpeedMin', 'scanEnable', 'measurement',
@@ -284,12 +342,22 @@ class TEMFiberStretcher(DataSource):
         return dataSet
 
     async def readPulseFromQueue(self):
-        while True:
-            # yield control to the event loop once
-            await asyncio.sleep(0)
+        lastSeq = 0
+        async for batches in read_queue_batches(self._pulseQueue, self._loop):
+            for seq in itertools.chain.from_iterable(batches):
+                if seq != lastSeq + 1:
+                    self.set_trait('droppedPulses',
+                                   self.droppedPulses + seq - lastSeq - 1)
+                lastSeq = seq
+
+                try:
+                    pulse, _ = self._pulseRing.read(seq)
+                except PulseOverrun:
+                    logging.warning("TEMFiberStretcher: Pulse buffer overrun, "
+                                    "dropping pulse")
+                    self.set_trait('droppedPulses', self.droppedPulses + 1)
+                    continue
 
-            while not self._pulseQueue.empty():
-                pulse = self._pulseQueue.get()
                 pulse = Q_(pulse)
 
                 axis = (self.recStart + np.arange(len(pulse)) *
@@ -300,6 +368,46 @@ class TEMFiberStretcher(DataSource):
 
                 self.set_trait('currentData', data)
 
+    @observe('recStart', 'recStop', 'recInterval', 'pulseBufferSlots')
+    def _resizePulseRing(self, change):
+        if self._pulseRing is None:
+            return
+
+        slotLength = max(self._pulseSlotLength(), self._pulseRing.slotLength)
+        if (slotLength > self._pulseRing.slotLength or
+                self.pulseBufferSlots != self._pulseRing.slots):
+            logging.info("TEMFiberStretcher: Restarting the data reader with "
+                         "{} pulse slots of {} points"
+                         .format(self.pulseBufferSlots, slotLength))
+            self._stopPulseReader()
+            self._startPulseReader(slotLength)
+
+    def _pulseSlotLength(self):
+        interval = self.recInterval.to('ps').magnitude
+        if interval <= 0:
+            return slotLengthFor(0)
+
+        span = (self.recStop - self.recStart).to('ps').magnitude
+        return slotLengthFor(np.ceil(abs(span) / interval) + 1)
+
+    def _startPulseReader(self, slotLength):
+        self._pulseQueue = Queue()
+        self._pulseRing = PulseRingBuffer(slots=self.pulseBufferSlots,
+                                          slotLength=slotLength)
+        self._pulseReader = Process(target=read_pulse_data,
+                                    args=(self.dataPort, self._pulseQueue,
+                                          self._pulseRing))
+        self._pulseReader.start()
+        self._pulseFromQueueReader = \
+            ensure_weakly_binding_future(self.readPulseFromQueue)
+
+    def _stopPulseReader(self):
+        self._pulseFromQueueReader.cancel()
+        self._pulseReader.terminate()
+        self._pulseReader.join()
+        self._pulseRing.close()
+        self._pulseRing = None
+
     @action("Reset counter", group="Data acquisition")
     def resetCounter(self):
         self.send("ResetCounter")
@@ -322,12 +430,8 @@ class TEMFiberStretcher(DataSource):
         self.measurement = True
         self.dcOut = True
 
-        self._pulseQueue = Queue()
-        self._pulseReader = Process(target=read_pulse_data,
-                                    args=(self.dataPort, self._pulseQueue))
-        self._pulseReader.start()
-        self._pulseFromQueueReader = \
-            ensure_weakly_binding_future(self.readPulseFromQueue)
+        # resized once the device reports its settings, see _resizePulseRing
+        self._startPulseReader(self._pulseSlotLength())
 
         return self
 
@@ -339,7 +443,7 @@ class TEMFiberStretcher(DataSource):
         self._controlTransport.close()
         self._pulseFromQueueReader.cancel()
         await asyncio.sleep(1)
-        self._pulseReader.terminate()
+        self._stopPulseReader()
         await super().__aexit__(*args)
 
 
@@ -45,6 +45,8 @@ class TeraK15(DataSource):
         super().__init__(objectName, loop)
         self.name_or_ip = name_or_ip
         self._setAveragesReachedFuture = asyncio.Future()
+        self._encodedTimeAxis = None
+        self._timeAxis = None
 
     async def __aenter__(self):
         await self._establish_connection()
@@ -77,20 +79,46 @@ class TeraK15(DataSource):
         self.set_trait("currentRate", Q_(new_val, "Hz"))
 
     def acq_begin_changed(self, new_val):
+        self._invalidateTimeAxis()
         self.set_trait("acq_begin", Q_(new_val, "ps"))
 
     def acq_range_changed(self, new_val):
+        self._invalidateTimeAxis()
         self.set_trait("acq_range", Q_(new_val, "ps"))
 
     def acq_end_changed(self, new_val):
+        self._invalidateTimeAxis()
         self.set_trait("acq_end", Q_(new_val, "ps"))
 
     def desired_averages_changed(self, new_val):
         self.set_trait("desiredAverages", new_val)
 
     def _decodeData(self, data):
+        if isinstance(data, numpy.ndarray):
+            # already decoded from a binary frame
+            return data
         return numpy.frombuffer(base64.b64decode(data), dtype=numpy.float64)
 
+    def _invalidateTimeAxis(self):
+        self._encodedTimeAxis = None
+        self._timeAxis = None
+
+    def _getTimeAxis(self):
+        """
+        Returns the decoded time axis in ps, or None if the device has not
+        published one yet. The decoded axis is cached until begin, end or
+        range change, or a new time axis is published.
+        """
+        encoded = self.scancontrol.timeAxis
+        if encoded is None:
+            return None
+
+        if self._timeAxis is None or encoded is not self._encodedTimeAxis:
+            self._encodedTimeAxis = encoded
+            self._timeAxis = Q_(self._decodeData(encoded), "ps")
+
+        return self._timeAxis
+
     def _decodeAmpArray(self, data):
         encAmpData = data["amplitude"]
         decAmpData = []
@@ -121,14 +149,11 @@ class TeraK15(DataSource):
     """
 
     def _onPulseReady(self, data):
-        data = self._decodeAmpArray(data)
-        if self.scancontrol.timeAxis is not None:
-            decTimeAxis = self._decodeData(self.scancontrol.timeAxis)
-            if len(data["amplitude"][0]) == len(decTimeAxis):
-                data["timeaxis"] = decTimeAxis
-                decTimeAxis = Q_(decTimeAxis, "ps")
-
-                data = DataSet(Q_(data["amplitude"][0], "mV"), [decTimeAxis])
+        timeAxis = self._getTimeAxis()
+        if timeAxis is not None:
+            amplitude = self._decodeData(data["amplitude"][0])
+            if len(amplitude) == len(timeAxis):
+                data = DataSet(Q_(amplitude, "mV"), [timeAxis])
 
                 self.set_trait("currentData", data)
                 self.set_trait("currentAverages", min(self.currentAverages + 1,
@@ -9,13 +9,45 @@ import asyncio
 import json
 import numpy
 import base64
+import struct
+
+
+def decodeBinaryMessage(frame):
+    """ Decodes a binary QWebChannel frame.
+
+    A binary frame consists of the length of a JSON header as a little endian
+    uint32, the JSON header and a binary payload. The header is an ordinary
+    QWebChannel message in which arrays may be replaced by placeholders of the
+    form ``{"$buffer": {"offset": o, "length": n, "dtype": "<f8"}}``,
+    referring to ``n`` bytes of the payload starting at ``o``. The
+    placeholders are replaced by read-only numpy arrays sharing the memory of
+    the frame, so no data is copied.
+    """
+    headerLength, = struct.unpack_from('<I', frame)
+    message = json.loads(bytes(frame[4:4 + headerLength]).decode('utf-8'))
+    payload = memoryview(frame)[4 + headerLength:]
+
+    def resolve(obj):
+        if isinstance(obj, dict):
+            buffer = obj.get('$buffer')
+            if buffer is not None and len(obj) == 1:
+                offset = buffer['offset']
+                return numpy.frombuffer(
+                    payload[offset:offset + buffer['length']],
+                    dtype=buffer.get('dtype', '<f8'))
+            return {k: resolve(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [resolve(v) for v in obj]
+        return obj
+
+    return resolve(message)
 
 
 class QWebChannelWebSocketProtocol(client.WebSocketClientProtocol):
     """ Bridges WebSocketClientProtocol and QWebChannel.
 
     Continuously reads messages in a task and invokes QWebChannel.message_received()
-    for each. Calls QWebChannel.connection_open() when connected.
+    for each. Binary frames are decoded with `decodeBinaryMessage`. Calls QWebChannel.connection_open() when connected.
     Also patches QWebChannel.send() to run the websocket's send() in a task"""
 
     def __init__(self, *args, **kwargs):
@@ -37,6 +69,8 @@ class QWebChannelWebSocketProtocol(client.WebSocketClientProtocol):
 
     async def read_msgs(self):
         async for msg in self:
+            if isinstance(msg, bytes):
+                msg = decodeBinaryMessage(msg)
             self.webchannel.message_received(msg)
 
 
@@ -66,6 +100,9 @@ class ScanControlClient(QObject):
             self.loop = asyncio.get_event_loop()
 
     def _decodeData(self, data):
+        if isinstance(data, numpy.ndarray):
+            # already decoded from a binary frame
+            return data
         return numpy.frombuffer(base64.b64decode(data), dtype=numpy.float64)
 
     def _decodeAmpArray(self, data):
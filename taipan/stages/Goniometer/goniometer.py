@@ -26,7 +26,14 @@ import enum
 import traitlets
 import logging
 import os
-from taipan.asyncioext import ensure_weakly_binding_future
+from concurrent.futures import ThreadPoolExecutor
+from taipan.asyncioext import ensure_weakly_binding_future, threaded_async
+
+
+# The DLL is shared by all axes and not known to be thread safe: all calls
+# into it go through this single thread, keeping them off the event loop.
+_dllExecutor = ThreadPoolExecutor(max_workers=1,
+                                  thread_name_prefix='Goniometer DLL')
 
 
 class GonioConn:
@@ -138,43 +145,56 @@ class Goniometer(Manipulator):
                                              self.cdll.GetPosition(self.axis)))
         self.velocity = Q_(5, 'deg/s')
 
-        self._statusRefresh = 0.1
+        self.idlePollInterval = Q_(100, 'ms')
         self._isMovingFuture = asyncio.Future()
         self._isMovingFuture.set_result(None)
         self._updateFuture = ensure_weakly_binding_future(self.updateStatus)
 
+    @threaded_async(executor=_dllExecutor)
+    def _dll(self, function, *args):
+        return getattr(self.cdll, function)(*args)
+
+    @threaded_async(executor=_dllExecutor)
+    def _readStatus(self):
+        return (self.cdll.GetPosition(self.axis),
+                self.cdll.GetLSStatus(self.axis),
+                self.cdll.GetReadyStatus(self.axis))
+
     async def updateStatus(self):
         while True:
-            await asyncio.sleep(self._statusRefresh)
+            await self._waitForNextPoll()
             if (Goniometer.connection is None):
                 continue
             await self.singleUpdate()
 
     async def singleUpdate(self):
-        steps = self.cdll.GetPosition(self.axis)
+        steps, ls, ready = await self._readStatus()
         self.set_trait('value', self._stepToDeg(steps))
-        ls = self.cdll.GetLSStatus(self.axis)
         self.set_trait('positiveLimitSwitch', bool(ls & 1))
         self.set_trait('negativeLimitSwitch', bool(ls & 2))
 
-        self.set_trait('isMoving',
-                       not bool(self.cdll.GetReadyStatus(self.axis)))
+        self.set_trait('isMoving', not bool(ready))
         if self.isMoving:
             self.set_trait('status', self.Status.Moving)
         else:
             self.set_trait('status', self.Status.Idle)
+            self._moveFinished()
             if not self._isMovingFuture.done():
                 self._isMovingFuture.set_result(None)
 
     async def __aexit__(self, *args):
-        self.stop()
+        await self._dll('StopMotion', self.axis,
+                        Goniometer.Ramping.Ramping.value)
+        self._isMovingFuture.cancel()
         self._updateFuture.cancel()
         await super().__aexit__(*args)
 
     @action("Stop")
     def stop(self, stopMode=Ramping.Ramping):
-        self.cdll.StopMotion(self.axis, stopMode.value)
+        self._loop.run_in_executor(_dllExecutor, self.cdll.StopMotion,
+                                   self.axis, stopMode.value)
         self._isMovingFuture.cancel()
+        self._moveFinished()
 
     #@action("Reference")
     async def reference(self):
@@ -183,24 +203,32 @@ class Goniometer(Manipulator):
                          'movement before searching Limit Switch')
             return False
 
-        self._setSpeedProfile(Q_(5, 'deg/s'))
-        self.cdll.SetRunFreeFrq(self.axis, 100)
-        self.cdll.SetRunFreeSteps(self.axis, 32000)
+        @threaded_async(executor=_dllExecutor)
+        def searchLS():
+            self._setSpeedProfile(Q_(5, 'deg/s'))
+            self.cdll.SetRunFreeFrq(self.axis, 100)
+            self.cdll.SetRunFreeSteps(self.axis, 32000)
+            self.cdll.SearchLS(self.axis, ord('-'))
 
-        self.cdll.SearchLS(self.axis, ord('-'))
+        @threaded_async(executor=_dllExecutor)
+        def runLSFree():
+            self.cdll.FindLS(self.axis, ord('-'))
+            self.cdll.RunLSFree(self.axis, ord('-'))
 
+        await searchLS()
+        self._moveStarted()
         self._isMovingFuture = asyncio.Future()
         await self._isMovingFuture
 
-        self.cdll.FindLS(self.axis, ord('-'))
-        self.cdll.RunLSFree(self.axis, ord('-'))
-
+        await runLSFree()
+        self._moveStarted()
         self._isMovingFuture = asyncio.Future()
         await self._isMovingFuture
 
-        self.cdll.SetPosition(self.axis, 0)
+        await self._dll('SetPosition', self.axis, 0)
 
     def _setSpeedProfile(self, velocity):
+        """ Must be called in the DLL thread. """
         ss = int(self.startSpeed.to('deg/s').magnitude*400)
         fs = int(velocity.to('deg/s').magnitude*400)
         ac = int(self.acceleration.to('deg/s**2').magnitude*400)
@@ -216,16 +244,9 @@ class Goniometer(Manipulator):
         else:
             return True
 
-    async def moveTo(self, val: float, velocity=None):
-        if velocity is None:
-            velocity = self.velocity
-
-        # The Goniometer ignores new position commands, if the stage is moving
-        if self.isMoving:
-            self.stop()
-            while self.status != self.Status.Idle:
-                await asyncio.sleep(0)
-
+    def _prepareMotion(self, val, velocity):
+        """ Set destination and speed profile. Must be called in the DLL
+        thread. """
         error = self.cdll.SetDestination(self.axis, self._degToStep(val),
                                          ord('a'))
 
@@ -237,7 +258,10 @@ class Goniometer(Manipulator):
             return False
 
         self._setSpeedProfile(velocity)
+        return True
 
+    def _startMotion(self):
+        """ Must be called in the DLL thread. """
         error = self.cdll.StartMotion(self.axis,
                                       Goniometer.Ramping.Ramping.value)
         if error != 0:
@@ -247,17 +271,84 @@ class Goniometer(Manipulator):
                           .format(self, self.axis))
             return False
 
+        return True
+
+    async def _haltForMove(self):
+        """ The Goniometer ignores new position commands while the stage is
+        moving. Stop it and wait until the next status update reports it
+        idle. """
+        if not self.isMoving:
+            return
+
+        await self._dll('StopMotion', self.axis,
+                        Goniometer.Ramping.Ramping.value)
+        self._isMovingFuture.cancel()
+        self._moveStarted()
         self._isMovingFuture = asyncio.Future()
         await self._isMovingFuture
 
+    async def moveTo(self, val: float, velocity=None):
+        if not await coordinatedMove([(self, val)], velocity):
+            return False
+
     @action('Set Calibration')
     def calibrate(self, value=None):
         if value is None:
             value = self.calibrateToDegree
-        self.cdll.SetPosition(self.axis, self._degToStep(value))
+        self._loop.run_in_executor(_dllExecutor, self.cdll.SetPosition,
+                                   self.axis, self._degToStep(value))
 
     def _degToStep(self, degs):
         return int(degs.to('deg').magnitude*400)
 
     def _stepToDeg(self, steps):
         return Q_(steps/400.0, 'deg')
+
+
+async def coordinatedMove(moves, velocity=None):
+    """ Move several goniometer axes at once, e.g. emitter and detector of a
+    symmetric setup.
+
+    The destinations of all axes are set first, then the motion of all axes
+    is started in quick succession, so the axes start at (nearly) the same
+    time.
+
+    Parameters
+    ----------
+    moves : iterable of tuples
+        Pairs of a `Goniometer` and its target position.
+
+    velocity : Quantity, optional
+        The velocity of all axes. Default: the ``velocity`` of each axis.
+
+    Returns
+    -------
+    bool
+        Whether all axes accepted the move. Returns once all axes that
+        started moving have arrived.
+    """
+    moves = list(moves)
+    velocities = [velocity if velocity is not None else gonio.velocity
+                  for gonio, _ in moves]
+
+    await asyncio.gather(*(gonio._haltForMove() for gonio, _ in moves))
+
+    @threaded_async(executor=_dllExecutor)
+    def start():
+        prepared = [gonio._prepareMotion(target, v)
+                    for (gonio, target), v in zip(moves, velocities)]
+        return [ok and gonio._startMotion()
+                for (gonio, _), ok in zip(moves, prepared)]
+
+    started = await start()
+
+    futures = []
+    for (gonio, target), v, ok in zip(moves, velocities, started):
+        if not ok:
+            continue
+        gonio._moveStarted(gonio._expectedMoveDuration(target, v))
+        gonio._isMovingFuture = asyncio.Future()
+        futures.append(gonio._isMovingFuture)
+
+    await asyncio.gather(*futures)
+    return all(started)
@@ -5,7 +5,7 @@ from asyncioext import ensure_weakly_binding_future
 import enum
 import traitlets
 from common import ureg, Q_
-from queue import Queue
+from stages.venus import VenusScheduler
 import numpy as np
 
 
@@ -38,12 +38,8 @@ class Hydra(Manipulator):
         def __init__(self, parent):
             self.parent = parent
 
-        async def _read_reply(self, type):
-            fut = asyncio.Future()
-            self.parent._pendingReplies.put(fut)
-
-            reply = await fut
-
+        @staticmethod
+        def parse(reply, type):
             if type is str:
                 return reply.decode('ascii')
             else:
@@ -52,23 +48,32 @@ class Hydra(Manipulator):
                     ret = ret[0]
                 return ret
 
+        async def _read_reply(self, fut, type):
+            return self.parse(await fut, type)
+
+        def command(self, name, *args, includeAxis=True, terminate=True):
+            cmd = [ str(x) for x in args ]
+            if includeAxis:
+                cmd.append(str(self.parent.axis))
+            cmd.append(name)
+            cmd = ' '.join(cmd)
+
+            if terminate:
+                cmd += '\r\n'
+            else:
+                cmd += ' '
+
+            return cmd.encode('ascii')
+
         def __getattr__(self, name):
             def _impl(*args, type=None, includeAxis=True, terminate=True):
-                cmd = [ str(x) for x in args ]
-                if includeAxis:
-                    cmd.append(str(self.parent.axis))
-                cmd.append(name)
-                cmd = ' '.join(cmd)
+                cmd = self.command(name, *args, includeAxis=includeAxis,
+                                   terminate=terminate)
 
-                if terminate:
-                    cmd += '\r\n'
-                else:
-                    cmd += ' '
-
-                self.parent.transport.write(cmd.encode('ascii'))
+                fut = self.parent._scheduler.send(cmd, type is not None)
 
                 if type is not None:
-                    return self._read_reply(type)
+                    return self._read_reply(fut, type)
 
             return _impl
 
@@ -84,30 +89,27 @@ class Hydra(Manipulator):
         self._isMovingFuture = asyncio.Future()
         self._isMovingFuture.set_result(None)
 
+        # the controller is fast, poll more often than the default
+        self.idlePollInterval = Q_(250, 'ms')
+        self.movingPollInterval = Q_(10, 'ms')
+
         self._raw = Hydra.HydraRaw(self)
+        self._scheduler = None
+        self._statusQueries = None
 
     def connection_made(self, transport):
-        self._buffer = b''
-        self._pendingReplies = Queue()
         self.transport = transport
+        self._scheduler = VenusScheduler(transport.write)
+        self._statusQueries = [self._raw.command('nst'),
+                               self._raw.command('np'),
+                               self._raw.command('gsp', includeAxis=False)]
 
     def connection_lost(self, exc):
         self.transport = None
+        self._scheduler.connection_lost(exc)
 
     def data_received(self, data):
-        self._buffer += data
-
-        while True:
-            i = self._buffer.find(b'\n')
-            if i < 0:
-                break
-
-            if not self._pendingReplies.empty():
-                fut = self._pendingReplies.get()
-                if not fut.done():
-                    fut.set_result(self._buffer[:i+1].strip())
-
-            self._buffer = self._buffer[i+1:]
+        self._scheduler.data_received(data)
 
     def eof_received(self):
         pass
@@ -143,23 +145,28 @@ class Hydra(Manipulator):
     async def updateStatus(self):
         while True:
             await self.singleUpdate()
-            await asyncio.sleep(0.01)
+            await self._waitForNextPoll()
 
     async def singleUpdate(self):
         movFut = self._isMovingFuture
 
-        self._status = await self._raw.nst(type=int)
-        self.set_trait('value', Q_(await self._raw.np(type=float), 'mm'))
+        status, position, numberParamStack = \
+            await self._scheduler.poll(self._statusQueries)
+
+        self._status = self._raw.parse(status, int)
+        self.set_trait('value', Q_(self._raw.parse(position, float), 'mm'))
         self.set_trait('numberParamStack',
-                       await self._raw.gsp(includeAxis=False, type=int))
+                       self._raw.parse(numberParamStack, int))
 
         self.set_trait('status',
                        self.Status.Moving
                        if bool(self._status & self.StatusBits.AxisMoving.value)
                        else self.Status.Idle)
 
-        if self.status != self.Status.Moving and not movFut.done():
-            movFut.set_result(None)
+        if self.status != self.Status.Moving:
+            self._moveFinished()
+            if not movFut.done():
+                movFut.set_result(None)
 
     @action('Calibrate')
     async def calibrationMove(self):
@@ -168,6 +175,7 @@ class Hydra(Manipulator):
         '''
         logging.debug('Hydra: Calibration Move Triggered')
         self._raw.ncal()
+        self._moveStarted()
         if self._isMovingFuture.done():
             self._isMovingFuture = asyncio.Future()
         await self._isMovingFuture
@@ -177,6 +185,7 @@ class Hydra(Manipulator):
         '''Finds upper hardware limit'''
         logging.debug('Hydra: Range Move Triggered')
         self._raw.nrm()
+        self._moveStarted()
         if self._isMovingFuture.done():
             self._isMovingFuture = asyncio.Future()
         await self._isMovingFuture
@@ -202,6 +211,7 @@ class Hydra(Manipulator):
         self._raw.nabort()
         logging.debug('Hydra: Movement aborted')
         self._isMovingFuture.cancel()
+        self._moveFinished()
 
     async def moveTo(self, val: float, velocity=None):
         await super().moveTo(val, velocity)
@@ -217,6 +227,7 @@ class Hydra(Manipulator):
         self._isMovingFuture = asyncio.Future()
 
         self._raw.nm(val.to('mm').magnitude)
+        self._moveStarted(self._expectedMoveDuration(val, velocity))
 
         await self._isMovingFuture
 
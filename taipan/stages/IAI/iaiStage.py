@@ -172,6 +172,7 @@ class IAIStage(Manipulator):
 
         self._identification = None
         self._isMovingFuture = asyncio.Future()
+        self.idlePollInterval = Q_(200, 'ms')
 
         self.setPreferredUnits(ureg.mm, ureg.mm / ureg.s)
 
@@ -189,10 +190,9 @@ class IAIStage(Manipulator):
 
     async def updateStatus(self):
         while True:
-            if (self.connection is None):
-                continue
-            await self.singleUpdate()
-            await asyncio.sleep(0.2)
+            if self.connection is not None:
+                await self.singleUpdate()
+            await self._waitForNextPoll()
 
     async def singleUpdate(self):
 
@@ -222,6 +222,7 @@ class IAIStage(Manipulator):
             self.set_trait('status', self.Status.Moving)
         else:
             self.set_trait('status', self.Status.Idle)
+            self._moveFinished()
             if not self._isMovingFuture.done():
                 self._isMovingFuture.set_result(None)
 
@@ -295,6 +296,7 @@ class IAIStage(Manipulator):
         if velocity is not None:
             self.velocity = velocity
 
+        expectedDuration = self._expectedMoveDuration(val)
         await self.setVelocity(self.velocity)
         posstr = self._convertPositionToHex(val)
 
@@ -302,6 +304,7 @@ class IAIStage(Manipulator):
             self._isMovingFuture = asyncio.Future()
 
         stat = await self.connection.send(self.axis + b'a' + posstr + b'00')
+        self._moveStarted(expectedDuration)
         self._parseStatusString(stat)
 
         await self._isMovingFuture
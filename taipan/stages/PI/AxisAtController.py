@@ -66,13 +66,13 @@ class AxisAtController(Manipulator):
         await super().__aenter__()
 
         self._identification = await self.send(b'*IDN?', includeAxis=False)
-        self._hardwareMinimum = await self.send(b'TMN?')
-        self._hardwareMaximum = await self.send(b'TMX?')
-        self.velocity = Q_(await self.send(b'VEL?'), 'mm/s')
-        self._isReferenced = bool(await self.send(b'FRF?'))
+        (self._hardwareMinimum, self._hardwareMaximum, velocity,
+         isReferenced) = await self.sendBatch((b'TMN?',), (b'TMX?',),
+                                              (b'VEL?',), (b'FRF?',))
+        self.velocity = Q_(velocity, 'mm/s')
+        self._isReferenced = bool(isReferenced)
 
-        await self.send("RON", 1)
-        await self.send("SVO", 1)
+        await self.sendBatch(("RON", 1), ("SVO", 1))
 
         self._updateFuture = ensure_weakly_binding_future(self.updateStatus)
 
@@ -101,7 +101,7 @@ class AxisAtController(Manipulator):
 
     async def updateStatus(self):
         while True:
-            await asyncio.sleep(0.5)
+            await self._waitForNextPoll()
             if (self.connection is None):
                 continue
 
@@ -110,11 +110,13 @@ class AxisAtController(Manipulator):
     async def singleUpdate(self):
         movFut = self._isMovingFuture
 
-        self._status = await self.send("SRG?", 1)
+        # poll status, position and reference state in a single round trip
+        self._status, position, isReferenced = await self.sendBatch(
+            ("SRG?", 1), (b'POS?',), (b'FRF?',))
 
-        self.set_trait('value', Q_(await self.send(b'POS?'), 'mm'))
+        self.set_trait('value', Q_(position, 'mm'))
 
-        self.set_trait('isReferenced', bool(await self.send(b'FRF?')))
+        self.set_trait('isReferenced', bool(isReferenced))
         self.set_trait('isReferencing',
                        bool(self._status & self.StatusBits.Referencing.value))
         self.set_trait('isOnTarget',
@@ -129,12 +131,27 @@ class AxisAtController(Manipulator):
             self.set_trait('status', self.Status.Moving)
         else:
             self.set_trait('status', self.Status.Idle)
+            self._moveFinished()
 
         if not movFut.done() and not self.isMoving:
             movFut.set_result(None)
 
 
-    async def send(self, command, *args, includeAxis=True):
+    def _prepareCommand(self, command, args, includeAxis):
+        # convert `command` to a bytearray
+        if isinstance(command, str):
+            command = bytearray(command, 'ascii')
+
+        isRequest = (command[-1] == ord(b'?'))
+
+        command = b'%d %s' % (self.address, command)
+
+        if includeAxis:
+            args = (self.axis,) + args
+
+        return command, args, isRequest
+
+    async def send(self, command, *args, includeAxis=True, checkError=True):
         """ Send a command to the controller. The axis ID will automatically
         appended, unless specified otherwise. If the command is a request,
         the reply will be parsed (if possible) and returned. Otherwise,
@@ -149,27 +166,77 @@ class AxisAtController(Manipulator):
 
         includeAxis (bool, optional) : Whether to transmit the axis id as the
         first argument to the command. Defaults to ``True``
+
+        checkError (bool, optional) : Whether to query the error state after
+        a command which is not a request. Defaults to ``True``
         """
         if self.connection is None:
             return None
 
-        # convert `command` to a bytearray
-        if isinstance(command, str):
-            command = bytearray(command, 'ascii')
-
-        isRequest = (command[-1] == ord(b'?'))
-
-        command = b'%d %s' % (self.address, command)
-
-        if includeAxis:
-            args = (self.axis,) + args
+        command, args, isRequest = self._prepareCommand(command, args,
+                                                        includeAxis)
 
         ret = await self.connection.send(command, *args)
 
         if not isRequest:
-            self.handleError(await self.send(b'ERR?', includeAxis=False))
+            if checkError:
+                await self.checkError()
             return
 
+        return self._parseReply(ret, command, args)
+
+    async def sendBatch(self, *commands, includeAxis=True, checkError=True):
+        """ Send several commands to the controller in a single write. The
+        replies to the requests are parsed in order. If the batch contains
+        commands which are not requests, the error state is queried once at
+        the end of the batch instead of after every command.
+
+        Parameters
+        ----------
+        *commands (tuple) : The commands to be sent, each given as a tuple
+        of the command followed by its arguments.
+
+        includeAxis (bool, optional) : Whether to transmit the axis id as the
+        first argument to each command. Defaults to ``True``
+
+        checkError (bool, optional) : Whether to query the error state at the
+        end of the batch. Defaults to ``True``
+
+        Returns
+        -------
+        list : The parsed reply for each command, or ``None`` for commands
+        which are not requests.
+        """
+        if self.connection is None:
+            return [None] * len(commands)
+
+        prepared = [self._prepareCommand(command[0], tuple(command[1:]),
+                                         includeAxis)
+                    for command in commands]
+        batch = [(command,) + args for command, args, _ in prepared]
+
+        needsErrorCheck = checkError and not all(isRequest for _, _, isRequest
+                                                 in prepared)
+        errorCommand = b'%d ERR?' % self.address
+        if needsErrorCheck:
+            batch.append((errorCommand,))
+
+        replies = await self.connection.sendBatch(*batch)
+
+        if needsErrorCheck:
+            self.handleError(self._parseReply(replies.pop(), errorCommand,
+                                              ()))
+
+        return [self._parseReply(reply, command, args) if isRequest else None
+                for reply, (command, args, isRequest)
+                in zip(replies, prepared)]
+
+    async def checkError(self):
+        """ Query the error state of the controller and pass it to
+        ``handleError``. """
+        self.handleError(await self.send(b'ERR?', includeAxis=False))
+
+    def _parseReply(self, ret, command, args):
         match = _replyExpression.match(ret)
         if not match:
             raise Exception("Unexpected reply %s to command %s" %
@@ -207,10 +274,12 @@ class AxisAtController(Manipulator):
         if velocity is None:
             velocity = self.velocity
 
-        await self.send("VEL", velocity.to('mm/s').magnitude)
+        expectedDuration = self._expectedMoveDuration(val, velocity)
 
-        await self.send("MOV", val.to('mm').magnitude)
+        await self.sendBatch(("VEL", velocity.to('mm/s').magnitude),
+                             ("MOV", val.to('mm').magnitude))
 
+        self._moveStarted(expectedDuration)
         self._isMovingFuture = asyncio.Future()
         await self._isMovingFuture
 
@@ -221,10 +290,12 @@ class AxisAtController(Manipulator):
 
         if not self._isMovingFuture.done():
             self._isMovingFuture.cancel()
+        self._moveFinished()
 
     @action("Home to ref. switch")
     async def reference(self):
         await self.send("FRF")
+        self._moveStarted()
         self._isMovingFuture = asyncio.Future()
         await self._isMovingFuture
         return self.isReferenced
@@ -239,31 +310,29 @@ class AxisAtController(Manipulator):
         # let the trigger output end half a step after the last position
         stop = start + (N - 1) * step + step / 2
 
-        # enable trig output on axis
-        await self.send(b"CTO", triggerId, 2, self.axis, includeAxis=False)
-
-        # set trig output to pos+offset mode
-        await self.send(b"CTO", triggerId, 3, 7, includeAxis=False)
-
-        # set trig distance to ``step``
-        await self.send(b"CTO", triggerId, 1, step, includeAxis=False)
-
-        # trigger start position
-        await self.send(b"CTO", triggerId, 10, start, includeAxis=False)
-
-        # trigger stop position
-        await self.send(b"CTO", triggerId, 9, stop, includeAxis=False)
-
-        # enable trigger output
-        await self.send(b"TRO", triggerId, 1, includeAxis=False)
-
-        # ask for the actually set start, stop and step parameters
-        self._trigStep = Q_(await self.send(b"CTO?", triggerId, 1,
-                                            includeAxis=False), 'mm')
-        self._trigStart = Q_(await self.send(b"CTO?", triggerId, 10,
-                                             includeAxis=False), 'mm')
-        self._trigStop = Q_(await self.send(b"CTO?", triggerId, 9,
-                                            includeAxis=False), 'mm')
+        (_, _, _, _, _, _, trigStep, trigStart, trigStop) = \
+            await self.sendBatch(
+                # enable trig output on axis
+                (b"CTO", triggerId, 2, self.axis),
+                # set trig output to pos+offset mode
+                (b"CTO", triggerId, 3, 7),
+                # set trig distance to ``step``
+                (b"CTO", triggerId, 1, step),
+                # trigger start position
+                (b"CTO", triggerId, 10, start),
+                # trigger stop position
+                (b"CTO", triggerId, 9, stop),
+                # enable trigger output
+                (b"TRO", triggerId, 1),
+                # ask for the actually set start, stop and step parameters
+                (b"CTO?", triggerId, 1),
+                (b"CTO?", triggerId, 10),
+                (b"CTO?", triggerId, 9),
+                includeAxis=False)
+
+        self._trigStep = Q_(trigStep, 'mm')
+        self._trigStart = Q_(trigStart, 'mm')
+        self._trigStop = Q_(trigStop, 'mm')
 
         return np.arange(self._trigStart.magnitude, self._trigStop.magnitude,
                          self._trigStep.magnitude) * ureg.mm
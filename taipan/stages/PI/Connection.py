@@ -56,6 +56,36 @@ class Connection(ComponentBase):
         if self.serial.isOpen():
             self.serial.close()
 
+    def _formatCommand(self, command, *args):
+        """ Builds the line to be sent for ``command`` and ``args``. Returns
+        the line and whether the command is a request. """
+        # convert `command` to a bytearray
+        if isinstance(command, str):
+            command = bytearray(command, 'ascii')
+        else:
+            command = bytearray(command)
+
+        isRequest = command[-1] == ord(b'?')
+
+        for arg in args:
+            if isinstance(arg, float):
+                command += b' %.6f' % arg
+            else:
+                command += b' %a' % arg
+
+        command += b'\n'
+
+        return command, isRequest
+
+    def _readReply(self):
+        # read reply. lines ending with ' \n' are part of a multiline
+        # reply.
+        replyLines = []
+        while len(replyLines) == 0 or replyLines[-1][-2:] == ' \n':
+            replyLines.append(self.serial.readline())
+
+        return b''.join(replyLines)
+
     @threaded_async
     def send(self, command, *args):
         """ Send a command over the Connection. If the command is a request,
@@ -69,21 +99,7 @@ class Connection(ComponentBase):
         """
 
         with self._lock:
-            # convert `command` to a bytearray
-            if isinstance(command, str):
-                command = bytearray(command, 'ascii')
-            else:
-                command = bytearray(command)
-
-            isRequest = command[-1] == ord(b'?')
-
-            for arg in args:
-                if isinstance(arg, float):
-                    command += b' %.6f' % arg
-                else:
-                    command += b' %a' % arg
-
-            command += b'\n'
+            command, isRequest = self._formatCommand(command, *args)
 
             if self.enableDebug:
                 logging.info(str(command))
@@ -94,10 +110,34 @@ class Connection(ComponentBase):
             if not isRequest:
                 return
 
-            # read reply. lines ending with ' \n' are part of a multiline
-            # reply.
-            replyLines = []
-            while len(replyLines) == 0 or replyLines[-1][-2:] == ' \n':
-                replyLines.append(self.serial.readline())
+            return self._readReply()
+
+    @threaded_async
+    def sendBatch(self, *commands):
+        """ Send several commands with a single write and read the replies
+        of the requests in order. The connection stays locked for the whole
+        batch, so the replies cannot be interleaved with those of other
+        axes on the same connection.
+
+        Parameters
+        ----------
+        *commands (tuple) : The commands to be sent, each given as a tuple
+        of the command followed by its arguments.
+
+        Returns
+        -------
+        list : The reply for each command, or ``None`` for commands which are
+        not requests.
+        """
+
+        with self._lock:
+            lines = [self._formatCommand(*command) for command in commands]
+            data = b''.join(line for line, _ in lines)
+
+            if self.enableDebug:
+                logging.info(str(data))
+
+            self.serial.write(data)
 
-            return b''.join(replyLines)
+            return [self._readReply() if isRequest else None
+                    for _, isRequest in lines]
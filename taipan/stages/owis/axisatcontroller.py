@@ -75,6 +75,7 @@ class AxisAtController(Manipulator):
         self.set_trait('statusMessage', self._StatusMap[self._status])
         self._isMovingFuture = asyncio.Future()
         self._isMovingFuture.set_result(None)
+        self.idlePollInterval = Q_(200, 'ms')
 
         self.prefPosUnit = (ureg.count / pitch).units
         self.prefVelocUnit = (ureg.count / ureg.s / pitch).units
@@ -125,7 +126,7 @@ class AxisAtController(Manipulator):
 
     async def updateStatus(self):
         while True:
-            await asyncio.sleep(0.2)
+            await self._waitForNextPoll()
 
             if (self.connection is None):
                 continue
@@ -148,6 +149,7 @@ class AxisAtController(Manipulator):
 
         if self._status not in self._movingStates:
             self.set_trait('status', self.Status.Idle)
+            self._moveFinished()
             if not movFut.done():
                 movFut.set_result(None)
         else:
@@ -200,6 +202,8 @@ class AxisAtController(Manipulator):
         if velocity is None:
             velocity = self.velocity
 
+        expectedDuration = self._expectedMoveDuration(val, velocity)
+
         with ureg.context(self.contextName):
             velocity = velocity.to('count/s').magnitude
 
@@ -217,6 +221,7 @@ class AxisAtController(Manipulator):
         await self.setAxisVariable("pvel", int(velocity))
         await self.setAxisVariable("pset", int(val))
         await self.send("pgo" + str(self.axis))
+        self._moveStarted(expectedDuration)
 
         if self._isMovingFuture.done():
             self._isMovingFuture = asyncio.Future()
@@ -227,6 +232,7 @@ class AxisAtController(Manipulator):
     async def halt(self):
         if not self._isMovingFuture.done():
             self._isMovingFuture.cancel()
+        self._moveFinished()
 
         await self.send('stop' + str(self.axis))
 
@@ -76,6 +76,7 @@ class TMCL(Manipulator):
         self.set_trait('status', self.Status.Idle)
         self._isMovingFuture = asyncio.Future()
         self._isMovingFuture.set_result(None)
+        self.idlePollInterval = Q_(200, 'ms')
 
     def _angle2steps(self, angle):
         convFactor = 0.9 if self.stepAngle == self.StepAngle.Step_0_9 else 1.8
@@ -111,7 +112,7 @@ class TMCL(Manipulator):
 
     async def _update(self):
         while True:
-            await asyncio.sleep(0.2)
+            await self._waitForNextPoll()
             await self._singleUpdate()
 
     async def _singleUpdate(self):
@@ -147,11 +148,13 @@ class TMCL(Manipulator):
         # move to target
         await self._mvp(val)
 
+        self._moveStarted()
         self.set_trait('status', self.Status.Moving)
         self._isMovingFuture = asyncio.Future()
 
         def _set_status(future):
             self.set_trait('status', self.Status.Idle)
+            self._moveFinished()
 
         self._isMovingFuture.add_done_callback(_set_status)
 
@@ -162,6 +165,7 @@ class TMCL(Manipulator):
             self.comm.mst(self.axis)
 
         self._isMovingFuture.cancel()
+        self._moveFinished()
 
 if __name__ == '__main__':
     loop = asyncio.get_event_loop()
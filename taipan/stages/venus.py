@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of Taipan.
+
+Taipan is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Taipan is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+from collections import deque
+
+
+class VenusScheduler:
+    """
+    Schedules the commands sent to a controller speaking a Venus-style
+    command language (Hydra, Corvus, SMC, ...).
+
+    These controllers answer requests line by line in the order the requests
+    were received, without any tag identifying the request. The scheduler
+    keeps track of the outstanding replies and assigns each incoming line to
+    the oldest one.
+
+    Commands are sent in two lanes:
+
+    * `send` writes user commands (moves, configuration, ...) immediately.
+    * `poll` writes status queries. All queries of a poll are coalesced into
+      a single write, and the write is held back until no user command is
+      waiting for its reply and no partially written command line is open,
+      so status polls never delay user commands by more than one batch.
+
+    The rate of the polls is up to the caller, see e.g.
+    `Manipulator._waitForNextPoll`.
+    """
+
+    def __init__(self, write):
+        """
+        Parameters
+        ----------
+        write : callable
+            Writes bytes to the controller, e.g. ``transport.write``.
+        """
+        self._write = write
+        self._buffer = bytearray()
+        self._pendingReplies = deque()
+        self._pendingUserReplies = 0
+        self._lineOpen = False
+        self._userLaneIdle = asyncio.Event()
+        self._userLaneIdle.set()
+        self._pollLock = asyncio.Lock()
+
+    def _updateUserLaneIdle(self):
+        if self._pendingUserReplies == 0 and not self._lineOpen:
+            self._userLaneIdle.set()
+        else:
+            self._userLaneIdle.clear()
+
+    def send(self, command, expectReply=False):
+        """ Write a user command to the controller.
+
+        Parameters
+        ----------
+        command : bytes
+            The command. Commands not ending with a newline are considered
+            to be continued by the next call.
+
+        expectReply : bool
+            Whether the controller answers the command.
+
+        Returns
+        -------
+        asyncio.Future or None
+            A future resolving to the (stripped) reply line, if a reply is
+            expected.
+        """
+        self._lineOpen = not command.endswith(b'\n')
+
+        fut = None
+        if expectReply:
+            fut = asyncio.Future()
+            self._pendingReplies.append((fut, True))
+            self._pendingUserReplies += 1
+
+        self._updateUserLaneIdle()
+        self._write(command)
+        return fut
+
+    async def poll(self, commands):
+        """ Send status queries as a single write once the user lane is idle.
+
+        Parameters
+        ----------
+        commands : list of bytes
+            Complete command lines, each of which is answered by one reply
+            line.
+
+        Returns
+        -------
+        list of bytes
+            The (stripped) reply lines, in order.
+        """
+        async with self._pollLock:
+            while not self._userLaneIdle.is_set():
+                await self._userLaneIdle.wait()
+
+            futures = []
+            for _ in commands:
+                fut = asyncio.Future()
+                self._pendingReplies.append((fut, False))
+                futures.append(fut)
+
+            self._write(b''.join(commands))
+            return await asyncio.gather(*futures)
+
+    def data_received(self, data):
+        """ Feed data received from the controller. """
+        self._buffer += data
+
+        while True:
+            i = self._buffer.find(b'\n')
+            if i < 0:
+                break
+
+            line = bytes(self._buffer[:i + 1]).strip()
+            del self._buffer[:i + 1]
+
+            if not self._pendingReplies:
+                continue
+
+            fut, isUserCommand = self._pendingReplies.popleft()
+            if isUserCommand:
+                self._pendingUserReplies -= 1
+                self._updateUserLaneIdle()
+            if not fut.done():
+                fut.set_result(line)
+
+    def connection_lost(self, exc=None):
+        """ Fail all outstanding replies. """
+        if exc is None:
+            exc = ConnectionError("Connection to the controller lost")
+
+        while self._pendingReplies:
+            fut, _ = self._pendingReplies.popleft()
+            if not fut.done():
+                fut.set_exception(exc)
+
+        self._pendingUserReplies = 0
+        self._lineOpen = False
+        self._updateUserLaneIdle()
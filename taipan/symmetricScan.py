@@ -11,7 +11,7 @@ from datasources import SR830
 import visa
 import os
 import traitlets
-from stages.Goniometer.goniometer import Goniometer
+from stages.Goniometer.goniometer import Goniometer, coordinatedMove
 import numpy as np
 import asyncio
 
@@ -97,14 +97,14 @@ async def run(loop):
                     emitterpos = 90+angle
                     detectorpos = 270-angle
                     
-                    await asyncio.wait([detector.moveTo(Q_(detectorpos,'deg')), 
-                                        emitter.moveTo(Q_(emitterpos,'deg'))])
+                    await coordinatedMove([(detector, Q_(detectorpos,'deg')),
+                                           (emitter, Q_(emitterpos,'deg'))])
                     print('angle: {}'.format(angle))
                     tdscan.dataSaver.mainFileName = 'Referenz-{}'.format(angle)
                     await tdscan.readDataSet()
                 
-                await asyncio.wait([detector.moveTo(Q_(180,'deg')), 
-                                    emitter.moveTo(Q_(180,'deg'))])
+                await coordinatedMove([(detector, Q_(180,'deg')),
+                                       (emitter, Q_(180,'deg'))])
                 
 
 if __name__ == '__main__':
@@ -9,6 +9,7 @@
 import array
 import asyncio
 import concurrent.futures
+import os
 import sys
 from typing import List, Optional, Union
 import logging
@@ -16,46 +17,241 @@ import serial
 
 
 class AioSerialTransport(asyncio.Transport):
+    """ A transport for `AioSerial` ports.
 
-    def __init__(self, loop, protocol, serial_instance):
+    On POSIX systems, the file descriptor of the port is watched by the event
+    loop (``add_reader``/``add_writer``): nothing runs while the port is
+    quiet, all waiting bytes are read at once when data arrives, and writes
+    that would block are buffered and flushed once the port is writable
+    again. Other platforms fall back to blocking reads in the read executor
+    of the `AioSerial` instance.
+    """
+
+    max_read_size = 65536
+
+    def __init__(self, loop, protocol, serial_instance, use_fd=None):
         self._loop = loop
         self._protocol = protocol
         self.serial = serial_instance
         self._closing = False
         self._paused = False
-        # XXX how to support url handlers too
-        self.serial.timeout = 0
+        self._protocol_paused = False
+        self._write_buffer = bytearray()
+        self._has_reader = False
+        self._has_writer = False
+        self._read_task = None
+        self.set_write_buffer_limits()
+
+        if use_fd is None:
+            use_fd = os.name == 'posix' and hasattr(serial_instance, 'fileno')
+        self._use_fd = use_fd
+
+        if self._use_fd:
+            # XXX how to support url handlers too
+            self.serial.timeout = 0
+            self.serial.write_timeout = 0
+            self._fd = self.serial.fileno()
+        else:
+            # block in the read executor, but wake up regularly to notice
+            # a closed port
+            self.serial.timeout = 0.1
+
         loop.call_soon(protocol.connection_made, self)
-        asyncio.ensure_future(self.read_ready())
+        loop.call_soon(self._ensure_reader)
 
     def __repr__(self):
         return '{self.__class__.__name__}({self._loop}, {self._protocol}, {self.serial})'.format(self=self)
 
+    def get_protocol(self):
+        return self._protocol
+
+    def set_protocol(self, protocol):
+        self._protocol = protocol
+
+    def is_closing(self):
+        return self._closing
+
     def close(self):
         if self._closing:
             return
         self._closing = True
-        self.serial.close()
-        self._loop.call_soon(self._protocol.connection_lost, None)
+        self._remove_reader()
+        if not self._write_buffer:
+            self._loop.call_soon(self._call_connection_lost, None)
+
+    def abort(self):
+        self._abort(None)
+
+    def _abort(self, exc):
+        self._closing = True
+        self._remove_reader()
+        self._remove_writer()
+        self._write_buffer.clear()
+        self._loop.call_soon(self._call_connection_lost, exc)
+
+    def _call_connection_lost(self, exc):
+        self._remove_reader()
+        self._remove_writer()
+        if self.serial is not None:
+            self.serial.close()
+        try:
+            self._protocol.connection_lost(exc)
+        finally:
+            self.serial = None
+
+    # reading
+
+    def _ensure_reader(self):
+        if self._has_reader or self._paused or self._closing:
+            return
+        self._has_reader = True
+        if self._use_fd:
+            self._loop.add_reader(self._fd, self._read_ready)
+        else:
+            self._read_task = self._loop.create_task(self._read_executor())
 
-    async def read_ready(self):
-        while not self._closing:
-            await asyncio.sleep(0)
-            data = await self.serial.read_async(1024)
+    def _remove_reader(self):
+        if not self._has_reader:
+            return
+        self._has_reader = False
+        if self._use_fd:
+            self._loop.remove_reader(self._fd)
+        elif self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+
+    def _read_ready(self):
+        try:
+            data = self.serial.read(
+                min(max(self.serial.in_waiting, 1), self.max_read_size))
+        except serial.SerialException as exc:
+            self._abort(exc)
+            return
+
+        if data:
+            self._protocol.data_received(data)
+
+    async def _read_executor(self):
+        while not self._closing and not self._paused:
+            try:
+                data = await self.serial.read_async(
+                    min(max(self.serial.in_waiting, 1), self.max_read_size))
+            except serial.SerialException as exc:
+                self._abort(exc)
+                return
             if data:
                 self._protocol.data_received(data)
 
+    def pause_reading(self):
+        self._paused = True
+        self._remove_reader()
+
+    def resume_reading(self):
+        self._paused = False
+        self._ensure_reader()
+
+    def is_reading(self):
+        return self._has_reader
+
+    # writing
+
     def write(self, data):
-        self.serial.write(data)
+        if self._closing:
+            return
+        if not data:
+            return
+
+        if not self._use_fd:
+            self.serial.write(data)
+            return
+
+        if not self._write_buffer:
+            try:
+                n = os.write(self._fd, data)
+            except (BlockingIOError, InterruptedError):
+                n = 0
+            except OSError as exc:
+                self._abort(exc)
+                return
+
+            if n == len(data):
+                return
+
+            data = memoryview(data)[n:]
+            self._ensure_writer()
+
+        self._write_buffer += data
+        self._maybe_pause_protocol()
+
+    def writelines(self, list_of_data):
+        self.write(b''.join(list_of_data))
+
+    def _ensure_writer(self):
+        if not self._has_writer:
+            self._has_writer = True
+            self._loop.add_writer(self._fd, self._write_ready)
+
+    def _remove_writer(self):
+        if self._has_writer:
+            self._has_writer = False
+            self._loop.remove_writer(self._fd)
+
+    def _write_ready(self):
+        try:
+            n = os.write(self._fd, self._write_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as exc:
+            self._abort(exc)
+            return
+
+        del self._write_buffer[:n]
+        self._maybe_resume_protocol()
+
+        if not self._write_buffer:
+            self._remove_writer()
+            if self._closing:
+                self._call_connection_lost(None)
 
     def can_write_eof(self):
         return False
 
-    #~ def set_write_buffer_limits(self, high=None, low=None):
-    #~ def get_write_buffer_size(self):
-    #~ def writelines(self, list_of_data):
-    #~ def write_eof(self):
-    #~ def abort(self):
+    def get_write_buffer_size(self):
+        return len(self._write_buffer)
+
+    def get_write_buffer_limits(self):
+        return (self._low_water, self._high_water)
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        if high is None:
+            high = 64 * 1024 if low is None else 4 * low
+        if low is None:
+            low = high // 4
+        if not high >= low >= 0:
+            raise ValueError('high ({!r}) must be >= low ({!r}) must be >= 0'
+                             .format(high, low))
+        self._high_water = high
+        self._low_water = low
+        self._maybe_pause_protocol()
+
+    def _maybe_pause_protocol(self):
+        if self.get_write_buffer_size() <= self._high_water:
+            return
+        if not self._protocol_paused:
+            self._protocol_paused = True
+            try:
+                self._protocol.pause_writing()
+            except Exception:
+                logging.exception('pause_writing() failed')
+
+    def _maybe_resume_protocol(self):
+        if (self._protocol_paused and
+                self.get_write_buffer_size() <= self._low_water):
+            self._protocol_paused = False
+            try:
+                self._protocol.resume_writing()
+            except Exception:
+                logging.exception('resume_writing() failed')
 
 
 class AioSerial(serial.Serial):
@@ -202,10 +398,65 @@ class AioSerial(serial.Serial):
                 raise
 
 
-@asyncio.coroutine
-def create_serial_connection(loop, protocol_factory, *args, **kwargs):
+async def create_serial_connection(loop, protocol_factory, *args, **kwargs):
     ser = AioSerial(loop=loop, *args, **kwargs)
     protocol = protocol_factory()
     transport = AioSerialTransport(loop, protocol, ser)
 
     return (transport, protocol)
+
+
+if __name__ == '__main__':
+    # Benchmark the transport against a pseudo terminal pair: measures the
+    # CPU time spent while the port is idle and the throughput of a burst.
+    import pty
+    import threading
+    import time
+
+    def benchmark(use_fd, total=4 * 1024 * 1024, chunk=4096):
+        master, slave = pty.openpty()
+        import tty
+        tty.setraw(master)
+        tty.setraw(slave)
+        loop = asyncio.new_event_loop()
+        received = [0]
+        done = loop.create_future()
+
+        class Counter(asyncio.Protocol):
+            def data_received(self, data):
+                received[0] += len(data)
+                if received[0] >= total and not done.done():
+                    done.set_result(None)
+
+        ser = AioSerial(port=os.ttyname(slave), baudrate=115200, loop=loop)
+        protocol = Counter()
+        transport = AioSerialTransport(loop, protocol, ser, use_fd=use_fd)
+
+        cpu = time.process_time()
+        loop.run_until_complete(asyncio.sleep(1))
+        idleCpu = time.process_time() - cpu
+
+        def feed():
+            payload = bytes(chunk)
+            for _ in range(total // chunk):
+                os.write(master, payload)
+
+        start = time.perf_counter()
+        cpu = time.process_time()
+        threading.Thread(target=feed, daemon=True).start()
+        loop.run_until_complete(done)
+        elapsed = time.perf_counter() - start
+        burstCpu = time.process_time() - cpu
+
+        transport.close()
+        loop.run_until_complete(asyncio.sleep(0.2))
+        loop.close()
+        os.close(master)
+        os.close(slave)
+
+        print('{:>12}: idle CPU {:6.3f} s/s, {:7.1f} MB/s, burst CPU {:.3f} s'
+              .format('add_reader' if use_fd else 'executor', idleCpu,
+                      total / elapsed / 1e6, burstCpu))
+
+    benchmark(True)
+    benchmark(False)
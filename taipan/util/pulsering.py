@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+This file is part of Taipan.
+
+Taipan is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Taipan is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Taipan.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class PulseOverrun(Exception):
+    """ Raised when a pulse has been overwritten by the writer before it was
+    read. """
+    pass
+
+
+def slotLengthFor(points, minimum=32768):
+    """ The slot length for pulses of up to ``points`` points: the next power
+    of two, but at least ``minimum``. Rounding up leaves room for growth, so
+    that a buffer does not have to be reallocated on every small change of
+    the pulse length. """
+    return max(minimum, 1 << max(int(points) - 1, 0).bit_length())
+
+
+class PulseRingBuffer:
+    """
+    A ring buffer of fixed-size pulse slots in shared memory.
+
+    The buffer is meant to hand pulses from a reader subprocess to the main
+    process without pickling them: the writer stores a pulse in the next slot
+    and only sends the returned sequence number through a
+    `multiprocessing.Queue` (or similar). The consumer then uses the sequence
+    number to read the pulse from shared memory.
+
+    Every slot has a header with the sequence number, the pulse length, a
+    device specific ``begin`` value and a timestamp. The writer invalidates the
+    sequence number before touching a slot and publishes it after the slot is
+    complete, so a consumer can detect that a slot has been overwritten (i.e.
+    it fell behind by more than ``slots`` pulses) by comparing the sequence
+    numbers before and after copying.
+
+    Instances can be passed to a `multiprocessing.Process`; the child process
+    attaches to the same shared memory block.
+    """
+
+    header = np.dtype([('seq', '<u8'), ('length', '<u4'), ('begin', '<i8'),
+                       ('timestamp', '<f8')])
+
+    def __init__(self, slots=64, slotLength=32768, dtype=np.float64):
+        """
+        Parameters
+        ----------
+        slots : int
+            The number of pulses the buffer can hold.
+        slotLength : int
+            The maximum number of points of a single pulse.
+        dtype : numpy.dtype
+            The data type of the pulse points.
+        """
+        self.slots = slots
+        self.slotLength = slotLength
+        self.dtype = np.dtype(dtype)
+        self._owner = True
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=self._bufferSize())
+        self._map()
+        self._headers[:] = 0
+        self._nextSeq = 1
+        self._pendingLength = None
+
+    def _bufferSize(self):
+        return (self.slots * self.header.itemsize +
+                self.slots * self.slotLength * self.dtype.itemsize)
+
+    def _map(self):
+        headersSize = self.slots * self.header.itemsize
+        self._headers = np.ndarray((self.slots,), dtype=self.header,
+                                   buffer=self._shm.buf)
+        self._data = np.ndarray((self.slots, self.slotLength),
+                                dtype=self.dtype, buffer=self._shm.buf,
+                                offset=headersSize)
+
+    def __getstate__(self):
+        return dict(name=self._shm.name, slots=self.slots,
+                    slotLength=self.slotLength, dtype=self.dtype.str)
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.slotLength = state['slotLength']
+        self.dtype = np.dtype(state['dtype'])
+        self._owner = False
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        if os.name == 'posix':
+            # Only the creating process may unlink the block. Without this,
+            # the resource tracker of the attaching process would remove it
+            # as soon as that process exits.
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self._map()
+        self._nextSeq = int(self._headers['seq'].max()) + 1
+        self._pendingLength = None
+
+    def reserve(self, length):
+        """
+        Reserve the next slot for writing and return a view of ``length``
+        points into it. The slot is published with `commit`.
+
+        Use this to decode a pulse directly into shared memory.
+        """
+        if length > self.slotLength:
+            raise ValueError("Pulse of length {} does not fit into slots of "
+                             "length {}".format(length, self.slotLength))
+
+        slot = self._nextSeq % self.slots
+        # invalidate the slot before it is overwritten
+        self._headers['seq'][slot] = 0
+        self._pendingLength = length
+        return self._data[slot, :length]
+
+    def commit(self, begin=0, timestamp=None):
+        """
+        Publish the slot obtained from `reserve`.
+
+        Returns
+        -------
+        int
+            The sequence number of the pulse.
+        """
+        if self._pendingLength is None:
+            raise RuntimeError("No slot has been reserved!")
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        seq = self._nextSeq
+        header = self._headers[seq % self.slots]
+        header['length'] = self._pendingLength
+        header['begin'] = begin
+        header['timestamp'] = timestamp
+        # the sequence number is written last, it marks the slot as valid
+        header['seq'] = seq
+
+        self._nextSeq += 1
+        self._pendingLength = None
+        return seq
+
+    def skip(self):
+        """
+        Use up the next sequence number without publishing a pulse, e.g. for
+        a pulse which had to be discarded. Consumers can detect the loss from
+        the gap in the sequence numbers.
+        """
+        self._nextSeq += 1
+        self._pendingLength = None
+
+    def write(self, pulse, begin=0, timestamp=None):
+        """
+        Copy a pulse into the next slot and publish it.
+
+        Returns
+        -------
+        int
+            The sequence number of the pulse.
+        """
+        self.reserve(len(pulse))[:] = pulse
+        return self.commit(begin, timestamp)
+
+    def read(self, seq):
+        """
+        Copy the pulse with the given sequence number out of the buffer.
+
+        Returns
+        -------
+        tuple
+            The pulse as a `numpy.ndarray` and its header as a
+            `numpy.void` with the fields ``seq``, ``length``, ``begin`` and
+            ``timestamp``.
+
+        Raises
+        ------
+        PulseOverrun
+            If the pulse has already been overwritten.
+        """
+        slot = seq % self.slots
+        header = self._headers[slot].copy()
+        if header['seq'] != seq:
+            raise PulseOverrun("Pulse {} has been overwritten".format(seq))
+
+        pulse = self._data[slot, :header['length']].copy()
+
+        if self._headers['seq'][slot] != seq:
+            raise PulseOverrun("Pulse {} has been overwritten while reading"
+                               .format(seq))
+
+        return pulse, header
+
+    def close(self):
+        """ Detach from the shared memory. The creating process also frees
+        it. """
+        self._headers = None
+        self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()